@@ -1,11 +1,15 @@
+import re
 from setuptools import setup, find_packages
 
+with open('zabbixlib/__init__.py') as f:
+    version = re.search(r"__version__ = '(.+)'", f.read()).group(1)
+
 setup(name='zabbixcli',
-      version = '1.0.6',
+      version = version,
       description = 'Tool for manage zabbix templates as YAML files.',
       author = 'Alexey Dubkov',
       author_email = 'alexey.dubkov@gmail.com',
-      packages = find_packages(),
+      packages = find_packages(exclude=['tests']),
       scripts = ['zabbixcli','zabbixcli-worker'],
       install_requires = ["argparse", "py-zabbix>=0.5.6"],
       url = 'https://github.com/blacked/zabbixcli',
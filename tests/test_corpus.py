@@ -0,0 +1,28 @@
+import os
+import shutil
+import tempfile
+import unittest
+import yaml
+from zabbixlib.corpus import ZabbixCorpus
+
+
+class CorpusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='zabbixcli-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_prototypes_of_rules_are_unique(self):
+        name, = ZabbixCorpus(items=10, discoveries=3, prototypes=4).write(self.tmp)
+        with open(os.path.join(self.tmp, name, 'discovery.yaml')) as f:
+            rules = yaml.safe_load(f)['discovery'].values()
+
+        for field, objects in (
+                ('name', [item for rule in rules for item in rule['items']]),
+                ('key', [item for rule in rules for item in rule['items']]),
+                ('name', [trigger for rule in rules for trigger in rule['triggers']]),
+                ('name', [graph for rule in rules for graph in rule['graphs']])):
+            values = [obj[field] for obj in objects]
+            self.assertEqual(len(values), len(set(values)), values)
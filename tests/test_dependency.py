@@ -0,0 +1,53 @@
+import collections
+import threading
+import unittest
+from zabbixlib.dependency import ZabbixScheduler
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def run_tasks(self, dependencies, fail={}, jobs=2):
+        done = []
+        lock = threading.Lock()
+
+        def func(name):
+            if name in fail:
+                raise fail[name]
+            with lock:
+                done.append(name)
+
+        errors = ZabbixScheduler(
+            collections.OrderedDict(dependencies), jobs).run(func)
+        return done, errors
+
+    def test_order(self):
+        done, errors = self.run_tasks([
+            ('c', ['b']),
+            ('b', ['a']),
+            ('a', []),
+        ])
+        self.assertEqual(done, ['a', 'b', 'c'])
+        self.assertEqual(errors, {})
+
+    def test_unknown_dependencies_are_ignored(self):
+        done, errors = self.run_tasks([('a', ['applied before'])])
+        self.assertEqual(done, ['a'])
+
+    def test_failure_skips_dependents(self):
+        done, errors = self.run_tasks([
+            ('a', []),
+            ('b', ['a']),
+            ('c', ['b']),
+            ('d', []),
+            ('e', ['d']),
+        ], fail={'a': ValueError('a')})
+        self.assertEqual(sorted(done), ['d', 'e'])
+        self.assertEqual(sorted(errors), ['a', 'b', 'c'])
+        self.assertIsInstance(errors['a'], ValueError)
+
+    def test_system_exit_stops_run(self):
+        with self.assertRaises(SystemExit):
+            self.run_tasks([
+                ('a', []),
+                ('b', ['a']),
+            ], fail={'a': SystemExit(1)})
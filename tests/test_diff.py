@@ -0,0 +1,51 @@
+import unittest
+from zabbixlib.diff import diff, equal, normalize
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_numeric_fields(self):
+        self.assertEqual(normalize(60, 'delay'), normalize('60', 'delay'))
+        self.assertEqual(normalize('1m', 'delay'), 60.0)
+        self.assertEqual(normalize('1.0', 'percent_left'), normalize(1, 'percent_left'))
+        self.assertEqual(normalize('12', 'itemid'), normalize(12, 'itemid'))
+        self.assertEqual(normalize(True, 'status'), 1.0)
+
+    def test_time_suffix_only_for_intervals(self):
+        self.assertNotEqual(normalize('1m', 'status'), normalize('60', 'status'))
+
+    def test_strings_are_exact(self):
+        self.assertNotEqual(normalize('1.10', 'name'), normalize('1.1', 'name'))
+        self.assertNotEqual(normalize('010', 'key_'), normalize('10', 'key_'))
+        self.assertNotEqual(normalize('inf', 'units'), normalize('Infinity', 'units'))
+        self.assertEqual(normalize(10, 'value'), normalize('10', 'value'))
+        self.assertEqual(normalize(None, 'description'), normalize('', 'description'))
+
+
+class EqualTest(unittest.TestCase):
+
+    def test_single_id(self):
+        self.assertTrue(equal([12], [{'applicationid': '12'}]))
+        self.assertFalse(equal([12], [{'applicationid': '13'}]))
+
+    def test_lists_ignore_order(self):
+        self.assertTrue(equal([1, 2], [{'templateid': '2'}, {'templateid': '1'}]))
+        self.assertFalse(equal([1, 2], [{'templateid': '1'}]))
+
+    def test_nested_dicts_ignore_missing_keys(self):
+        new = [{'itemid': 5, 'color': '00FF00'}]
+        current = [{'itemid': '5', 'color': '00FF00', 'gitemid': '7'}]
+        self.assertTrue(equal(new, current))
+        self.assertTrue(equal([{'itemid': 5, 'drawtype': 0}], [{'itemid': '5'}]))
+        self.assertFalse(equal([{'itemid': 5, 'color': 'FF0000'}], current))
+
+
+class DiffTest(unittest.TestCase):
+
+    def test_changed_fields(self):
+        req = {'name': 'CPU', 'delay': '1m', 'history': 7, 'key_': 'cpu[1.10]'}
+        current = {'name': 'CPU', 'delay': '60', 'history': '7', 'key_': 'cpu[1.1]'}
+        self.assertEqual(diff(req, current), {'key_': 'cpu[1.10]'})
+
+    def test_missing_field_is_changed(self):
+        self.assertEqual(diff({'units': '%'}, {}), {'units': '%'})
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import unittest
+from zabbixlib.jobqueue import ZabbixJobQueue
+
+
+class JobQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='zabbixcli-test-')
+        self.queue = ZabbixJobQueue(os.path.join(self.tmp, 'queue.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_taken_templates_stay_until_done(self):
+        self.queue.put(['a', 'b'], sha='1')
+        self.assertEqual(sorted(self.queue.take()), ['a', 'b'])
+        self.assertEqual(self.queue.pending(), 2)
+        self.assertIsNone(self.queue.finished())
+
+        self.queue.done('a')
+        self.queue.done('b')
+        self.assertEqual(self.queue.pending(), 0)
+        self.assertEqual(self.queue.finished(), '1')
+
+    def test_templates_of_killed_worker_are_taken_again(self):
+        self.queue.put(['a'], sha='1')
+        self.queue.take()
+        # Worker was killed, template was requested again meanwhile
+        self.queue.put(['a', 'b'], sha='2')
+        jobs = ZabbixJobQueue(self.queue.path).take()
+        self.assertEqual(sorted(jobs), ['a', 'b'])
+
+    def test_failed_templates_are_queued_again(self):
+        self.queue.put(['a', 'b'])
+        jobs = self.queue.take()
+        self.queue.done('b')
+        self.queue.retry(['a'])
+        self.assertEqual(self.queue.take(), {'a': jobs['a']})
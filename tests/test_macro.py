@@ -0,0 +1,42 @@
+import unittest
+from zabbixlib.fakeserver import ZabbixFakeStore
+from zabbixlib.macro import FINGERPRINT_MACRO, ZabbixMacros
+from zabbixlib.snapshot import ZabbixTemplateSnapshot
+
+
+class MacrosTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ZabbixFakeStore()
+        self.template_id = self.store.do_request(
+            'template.create', {'host': 'Template Test'})['result']['templateids'][0]
+        self.ids = {}
+        for macro, value in [('{$TIMEOUT}', '1m'),
+                             ('{$LIMIT}', '1.0'),
+                             ('{$SAME}', 'x'),
+                             ('{$OLD}', '1'),
+                             (FINGERPRINT_MACRO, 'abc')]:
+            self.ids[macro] = self.store.do_request('usermacro.create', {
+                'hostid': self.template_id,
+                'macro': macro,
+                'value': value})['result']['hostmacroids'][0]
+        self.snapshot = ZabbixTemplateSnapshot(self.store, self.template_id)
+
+    def test_changes(self):
+        macros = [
+            {'macro': '{$TIMEOUT}', 'value': '60'},
+            {'macro': '{$LIMIT}', 'value': 1},
+            {'macro': '{$SAME}', 'value': 'x'},
+            {'macro': '{$NEW}', 'value': 5},
+        ]
+        create, update, delete = ZabbixMacros(
+            self.store, macros, self.template_id, self.snapshot).changes()
+
+        self.assertEqual(create, [
+            {'macro': '{$NEW}', 'value': 5, 'hostid': self.template_id}])
+        self.assertEqual(
+            sorted((req['hostmacroid'], req['value']) for req in update),
+            sorted([(self.ids['{$TIMEOUT}'], '60'), (self.ids['{$LIMIT}'], 1)]))
+        # Fingerprint is never deleted
+        self.assertEqual(delete, [('{$OLD}', self.ids['{$OLD}'])])
+        self.assertEqual(self.snapshot.changes[('usermacro', 'unchanged')], 1)
@@ -0,0 +1,19 @@
+import unittest
+from zabbixlib.fakeserver import ZabbixFakeError, ZabbixFakeStore
+from zabbixlib.profiler import ZabbixProfiler
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_failed_calls_are_recorded(self):
+        profiler = ZabbixProfiler(ZabbixFakeStore())
+        profiler.do_request('template.get', {'output': 'extend'})
+        with self.assertRaises(ZabbixFakeError):
+            profiler.do_request('unknown.get', {})
+
+        methods = profiler.by_method()
+        self.assertEqual(len(methods['template.get']['latency']), 1)
+        self.assertEqual(methods['template.get']['errors'], 0)
+        self.assertEqual(len(methods['unknown.get']['latency']), 1)
+        self.assertEqual(methods['unknown.get']['errors'], 1)
+        self.assertEqual(methods['unknown.get']['received'], 0)
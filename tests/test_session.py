@@ -0,0 +1,59 @@
+import httplib
+import shutil
+import tempfile
+import unittest
+from zabbixlib.fakeserver import ZabbixFakeServer, ZabbixFakeStore
+from zabbixlib.session import ZabbixSession
+
+
+class LostResponseConnection(httplib.HTTPConnection):
+
+    """
+    Connection which loses response of first request, after server has
+    executed it.
+    """
+
+    lost = False
+
+    def getresponse(self, *args, **kwargs):
+        response = httplib.HTTPConnection.getresponse(self, *args, **kwargs)
+        if not self.lost:
+            self.lost = True
+            response.read()
+            raise httplib.BadStatusLine('')
+        return response
+
+
+class SessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='zabbixcli-test-')
+        self.store = ZabbixFakeStore()
+        self.server = ZabbixFakeServer(self.store).start()
+        self.session = ZabbixSession(
+            self.server.url, 'Admin', 'zabbix', cache_dir=self.tmp)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmp)
+
+    def lose_response(self):
+        self.session.local.conn = LostResponseConnection(
+            self.session.location.netloc)
+        self.store.calls.clear()
+
+    def test_read_request_is_sent_again(self):
+        self.lose_response()
+        result = self.session.do_request('hostgroup.get', {'output': 'extend'})
+        self.assertIn('result', result)
+        self.assertEqual(self.store.calls['hostgroup.get'], 2)
+
+    def test_create_request_is_not_sent_again(self):
+        self.lose_response()
+        with self.assertRaises(httplib.BadStatusLine):
+            self.session.do_request('hostgroup.create', {'name': 'Lost'})
+        self.assertEqual(self.store.calls['hostgroup.create'], 1)
+
+        # Next request uses new connection
+        result = self.session.do_request('hostgroup.get', {'filter': {'name': 'Lost'}})
+        self.assertEqual(len(result['result']), 1)
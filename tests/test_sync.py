@@ -0,0 +1,161 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+from zabbixlib import template
+from zabbixlib.cli import ZabbixCLI
+from zabbixlib.fakeserver import ZabbixFakeServer, ZabbixFakeStore
+from zabbixlib.macro import FINGERPRINT_MACRO
+
+TEMPLATE = '''name: "Template Test"
+groups:
+  - "Templates"
+macros:
+  - macro: "{$TIMEOUT}"
+    value: "1m"
+applications:
+  "CPU":
+    - name: "CPU load"
+      key: "system.cpu.load"
+      return_type: float
+    - name: "CPU idle"
+      key: "system.cpu.util[,idle]"
+      units: "%"
+discovery:
+  "Disks":
+    name: "Disk discovery"
+    key: "vfs.fs.discovery"
+    filter:
+      macro: "{#FSNAME}"
+      regexp: ".*"
+    items:
+      - name: "Free on {#FSNAME}"
+        key: "vfs.fs.size[{#FSNAME},free]"
+graphs:
+  - name: "CPU"
+    items:
+      - item: "CPU load"
+      - item: "CPU idle"
+        color: "FF0000"
+triggers:
+  - name: "High load"
+    expression: "{Template Test:system.cpu.load.last()}>5"
+    warn_level: high
+'''
+
+# Methods which change something
+CHANGES = ('create', 'update', 'delete')
+
+
+class SyncTest(unittest.TestCase):
+
+    """
+    Apply template to fake zabbix server.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='zabbixcli-test-')
+        self.templates_dir = os.path.join(self.tmp, 'templates')
+        os.makedirs(os.path.join(self.templates_dir, 'test'))
+        self.write(TEMPLATE)
+        self.store = ZabbixFakeStore()
+        self.server = ZabbixFakeServer(self.store).start()
+        self.environ = dict(os.environ)
+        self.cwd = os.getcwd()
+        os.environ['ZBXCLI_TEMPLATES'] = self.templates_dir
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.server.stop()
+        shutil.rmtree(self.tmp)
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def write(self, content):
+        with open(os.path.join(self.templates_dir, 'test', 'init.yaml'), 'w') as f:
+            f.write(content)
+
+    def apply(self, *args, **kwargs):
+        """
+        Apply template and return numbers of calls which change something.
+        """
+
+        self.store.calls.clear()
+        ZabbixCLI(argv=[
+            '-t', kwargs.get('name', 'Template Test'),
+            '-s', self.server.url,
+            '-u', 'Admin',
+            '-p', 'zabbix',
+            '-c', os.path.join(self.tmp, 'cache')] + list(args))
+        return dict(
+            (method, number) for method, number in self.store.calls.items()
+            if method.split('.', 1)[1] in CHANGES)
+
+    def find(self, obj_type, field, value):
+        for obj in self.store.tables[obj_type].values():
+            if obj.get(field) == value:
+                return obj
+
+    def test_round_trip(self):
+        changes = self.apply()
+        self.assertIn('item.create', changes)
+        self.assertIn('itemprototype.create', changes)
+        self.assertEqual(self.find('usermacro', 'macro', '{$TIMEOUT}')['value'], '1m')
+
+        # Unchanged template is skipped, or finds nothing to change
+        self.assertEqual(self.apply(), {})
+        self.assertEqual(self.apply('--force'), {})
+
+        self.write(TEMPLATE.replace('"1m"', '"60"').replace(
+            'units: "%"', 'units: "%"\n      interval: 30'))
+        changes = self.apply()
+        self.assertEqual(changes.get('item.update'), 1)
+        self.assertNotIn('itemprototype.update', changes)
+        self.assertNotIn('discoveryrule.update', changes)
+        self.assertEqual(self.find('usermacro', 'macro', '{$TIMEOUT}')['value'], '60')
+        self.assertEqual(int(self.find('item', 'name', 'CPU idle')['delay']), 30)
+
+        self.assertEqual(self.apply('--force'), {})
+
+    def test_action_of_template_requested_by_path(self):
+        self.write(TEMPLATE + '''alerts:
+  - name: "Notify"
+''')
+        os.chdir(self.tmp)
+        self.assertEqual(self.apply(name='templates/test').get('action.create'), 1)
+        self.assertEqual(self.apply('--force', name='templates/test'), {})
+        self.assertEqual(
+            [action['name'] for action in self.store.tables['action'].values()],
+            ['Template Test: Notify'])
+
+    def test_import_keeps_fingerprint(self):
+        self.apply('--engine', 'import')
+        self.apply('--engine', 'import', '--force')
+        self.assertEqual(self.apply('--engine', 'import'), {})
+        self.assertEqual(self.store.calls.get('configuration.import'), None)
+
+    def test_fingerprint_depends_on_requested_name_and_version(self):
+        self.apply()
+        os.chdir(self.tmp)
+        self.assertEqual(self.apply(name='templates/test'), {'usermacro.update': 1})
+        self.assertEqual(self.apply(name='templates/test'), {})
+
+        version = template.__version__
+        template.__version__ = version + '.1'
+        try:
+            self.assertEqual(self.apply(name='templates/test'), {'usermacro.update': 1})
+        finally:
+            template.__version__ = version
+
+    def test_render_only_does_not_save_fingerprint(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            ZabbixCLI(argv=['-t', 'Template Test', '--render-only'])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertIn('{$TIMEOUT}', output)
+        self.assertNotIn(FINGERPRINT_MACRO, output)
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import unittest
+from zabbixlib.template import ZabbixTemplateIndex
+
+
+class TemplateIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='zabbixcli-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, path, name):
+        path = os.path.join(self.tmp, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('name: "{0}"\n'.format(name))
+
+    def test_saved_index_is_fresh(self):
+        self.write('top.yaml', 'Template Top')
+        self.write('app/init.yaml', 'Template App')
+        ZabbixTemplateIndex(self.tmp + '/').refresh()
+
+        index = ZabbixTemplateIndex(self.tmp + '/')
+        self.assertEqual(index.find('Template Top'), self.tmp)
+        self.assertEqual(index.find('Template App'), os.path.join(self.tmp, 'app'))
+        self.assertFalse(index.refreshed)
+
+    def test_new_template_is_found_on_next_run(self):
+        self.write('app/init.yaml', 'Template App')
+        index = ZabbixTemplateIndex.get(self.tmp)
+        self.assertIsNone(index.find('Template New'))
+
+        self.write('new/init.yaml', 'Template New')
+        self.assertIsNone(index.find('Template New'))
+        ZabbixTemplateIndex.reset()
+        self.assertEqual(index.find('Template New'), os.path.join(self.tmp, 'new'))
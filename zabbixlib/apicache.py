@@ -0,0 +1,128 @@
+import collections
+import copy
+import json
+import logging
+import threading
+import time
+from zabbix.api import ZabbixAPI
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixAPICache(ZabbixAPI):
+
+    """
+    Wrap ZabbixAPI connector to remember results of get_id() calls.
+
+    Entries are evicted when cache is full (least recently used first) or
+    when they are older than ttl. Any change of objects of specific type,
+    made through this connector, drops all entries of that type.
+
+    Arguments:
+    zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
+    size        (int)             Max number of cached results.
+    ttl         (int)             Max age of cached result in seconds.
+                                  Default: no limit.
+    """
+
+    # Zabbix methods which change something
+    methods = ('create', 'update', 'delete',
+               'massadd', 'massremove', 'massupdate')
+
+    def __init__(self, zapi, size=1000, ttl=None):
+        self.zapi = zapi
+        self.size = size
+        self.ttl = ttl
+        # (type, name, filters): (time, result)
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, item_type, item, with_id, hostid, args):
+        return (
+            item_type,
+            json.dumps(item, sort_keys=True),
+            with_id,
+            hostid,
+            json.dumps(args, sort_keys=True))
+
+    def _lookup(self, key):
+        """
+        Return cached result and mark it as recently used.
+        """
+
+        with self.lock:
+            created, result = self.entries.pop(key)
+            if self.ttl is not None and time.time() - created > self.ttl:
+                raise KeyError(key)
+            self.entries[key] = (created, result)
+            self.hits += 1
+            return copy.deepcopy(result)
+
+    def _store(self, key, result):
+        with self.lock:
+            self.entries[key] = (time.time(), copy.deepcopy(result))
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, item_type=None):
+        """
+        Drop cached results of specific type, or all of them.
+        """
+
+        with self.lock:
+            for key in list(self.entries):
+                if item_type in (None, key[0]):
+                    del self.entries[key]
+
+    def get_id(self, item_type, item=None, with_id=False, hostid=None, **args):
+        """
+        Return cached result of ZabbixAPI.get_id(), or get it from server.
+        """
+
+        key = self._key(item_type, item, with_id, hostid, args)
+        try:
+            return self._lookup(key)
+        except KeyError:
+            pass
+
+        result = self.zapi.get_id(item_type, item, with_id, hostid, **args)
+        with self.lock:
+            self.misses += 1
+        self._store(key, result)
+        return result
+
+    def do_request(self, method, params=None):
+        """
+        Send request to zabbix server, drop cached results it could change.
+        """
+
+        obj_type, zbx_method = method.split('.', 1)
+        try:
+            return self.zapi.do_request(method, params)
+        finally:
+            if zbx_method in self.methods:
+                self.invalidate(obj_type)
+            elif zbx_method == 'import':
+                self.invalidate()
+
+    def reset_stats(self):
+        """
+        Forget statistic of cache usage, it's counted for each run.
+        """
+
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def report(self):
+        """
+        Log cache usage.
+        """
+
+        log.debug(
+            'Lookup cache: %s hits, %s misses, %s entries',
+            self.hits,
+            self.misses,
+            len(self.entries))
@@ -13,13 +13,15 @@ class ZabbixApp(ZabbixObject):
     Arguments:
     zapi  (ZabbixAPI)   ZabbixAPI connector to send request.
     obj   (dict)        Dictionary discribed zabbix application template.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, template_id):
+    def __init__(self, zapi, obj, template_id, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.template_id = template_id
         self.obj_type = 'application'
+        self.snapshot = snapshot
         ZabbixObject(self.zapi, self.obj)
 
     def apply(self):
@@ -31,13 +33,15 @@ class ZabbixApp(ZabbixObject):
         log.info("%s: '%s'", str(self.obj_type).capitalize(), self.obj)
 
         # Get 'application' object id
-        obj_id = self.zapi.get_id(
+        obj_id = self._get_id(
             'application',
             self.obj,
             hostid=self.template_id)
 
         if obj_id:
             result = obj_id
+            if self.snapshot:
+                self.snapshot.count(self.obj_type, 'unchanged')
         else:
             app = {
                 'name': self.obj,
@@ -46,5 +50,6 @@ class ZabbixApp(ZabbixObject):
 
             log.debug('call: sync_app({name}, {hostid})'.format(**app))
             result = self.zapi.application.create(app)
+            self._remember(self.obj, result)
             result = result['applicationids'][0]
         return result
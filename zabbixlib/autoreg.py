@@ -14,12 +14,16 @@ class ZabbixAutoreg(ZabbixObject):
     Arguments:
     zapi  (ZabbixAPI)   ZabbixAPI connector to send request.
     obj   (dict)        Dictionary discribed zabbix application template.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
+    groups      (ZabbixGroupRegistry)  Groups shared by all templates.
     """
 
-    def __init__(self, zapi, obj):
+    def __init__(self, zapi, obj, snapshot=None, groups=None):
         self.zapi = zapi
         self.obj = obj
         self.obj_type = 'action'
+        self.snapshot = snapshot
+        self.groups = groups
         ZabbixObject(self.zapi, self.obj)
 
     def _create_request(self):
@@ -74,7 +78,8 @@ class ZabbixAutoreg(ZabbixObject):
                     'operationtype': 4, 'esc_step_to': 1, 'esc_step_from': 1, 'esc_period': 0,
                     'opgroup': ZabbixGroups(
                         self.zapi,
-                        self.obj.get('autoreg')['add_to_group']).apply()
+                        self.obj.get('autoreg')['add_to_group'],
+                        self.groups).apply()
                 },
             )
         return result
@@ -91,24 +96,24 @@ class ZabbixAutoreg(ZabbixObject):
 
         # Get 'action' object id
         log.debug('ZabbixAutoreg._create_request: %s', req)
-        obj_id = self.zapi.get_id('action', req['name'])
+        obj_id = self._get_id('action', req['name'])
+
+        req.update({
+            'eventsource': 2,
+            'status': 0,
+            'esc_period': 0,
+            'evaltype': 0,
+        })
 
         if obj_id:
-            result = self.zapi.action.update(
-                actionid=obj_id,
-                eventsource=2,
-                status=0,
-                esc_period=0,
-                evaltype=0,
-                conditions=req['conditions'],
-                operations=req['operations'])
+            changes = self._changes(req['name'], req)
+            if changes:
+                changes.pop('name', None)
+                changes['actionid'] = obj_id
+                result = self.zapi.action.update(changes)
+            else:
+                log.debug("Unchanged action: '%s'", req['name'])
         else:
-            result = self.zapi.action.create(
-                name=req['name'],
-                eventsource=2,
-                status=0,
-                esc_period=0,
-                evaltype=0,
-                conditions=req['conditions'],
-                operations=req['operations'])
+            result = self.zapi.action.create(req)
+            self._remember(req['name'], result)
         return result
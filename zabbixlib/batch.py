@@ -0,0 +1,63 @@
+import collections
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixBatch(object):
+
+    """
+    Collect requests of zabbix objects and push them with a few API calls.
+
+    Zabbix API accepts array of objects in 'create' and 'update' methods, so
+    requests are grouped by object type and method, and sent in chunks.
+
+    Arguments:
+    zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
+    chunk_size  (int)             Max number of objects in one request.
+    """
+
+    def __init__(self, zapi, chunk_size=100):
+        self.zapi = zapi
+        self.chunk_size = chunk_size
+        self.requests = collections.OrderedDict()
+
+    def add(self, obj):
+        """
+        Build request for zabbix object and put it in the queue.
+
+        Arguments:
+        obj     (ZabbixObject)  Zabbix object to push.
+        """
+
+        zbx_method, req = obj._prepare()
+        if not zbx_method:
+            log.debug("Unchanged %s: '%s'", obj.obj_type, obj._get_name())
+            return
+
+        log.info("%s: '%s'", str(obj.obj_type).capitalize(), obj._get_name())
+        self.requests.setdefault(
+            (obj.obj_type, zbx_method), []).append((obj, req))
+
+    def flush(self):
+        """
+        Push all collected requests to zabbix server.
+        """
+
+        for (obj_type, zbx_method), requests in self.requests.iteritems():
+            func = "self.zapi.{obj_type}.{zbx_method}".format(
+                obj_type=obj_type,
+                zbx_method=zbx_method)
+
+            for i in range(0, len(requests), self.chunk_size):
+                chunk = requests[i:i + self.chunk_size]
+                reqs = [req for obj, req in chunk]
+                log.debug('%s: %s', func, reqs)
+                result = eval(func)(*reqs)
+
+                # Save ids of created objects
+                if zbx_method == 'create':
+                    for index, (obj, req) in enumerate(chunk):
+                        obj._remember(obj._get_name(), result, index)
+
+        self.requests.clear()
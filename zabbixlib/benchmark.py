@@ -0,0 +1,191 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from cli import ZabbixCLI
+from corpus import ZabbixCorpus
+from fakeserver import ZabbixFakeServer, ZabbixFakeStore
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixBenchmark(object):
+
+    """
+    Measure zabbixcli with synthetic templates of different size, applied
+    to fake zabbix server.
+
+    Each template is applied three times: first run creates all objects,
+    second one skips template as unchanged by its fingerprint, and third
+    one is forced to compare every object with zabbix and finds out that
+    nothing was changed. For each run wall time, number
+    of API calls by method and peak memory of process (including fake
+    server, which runs in the same process) are reported.
+
+    Arguments:
+    sizes       (list of int)     Number of items in templates.
+    latency     (float)           Seconds fake server waits on every call.
+    args        (list of str)     Additional arguments for zabbixcli.
+    seed        (int)             Seed to generate templates.
+    """
+
+    def __init__(self, sizes=(100, 1000, 10000), latency=0, args=None, seed=0):
+        self.sizes = sizes
+        self.latency = latency
+        self.seed = seed
+        self.args = args or []
+        self.results = []
+
+    def _generate(self, templates_dir, size):
+        """
+        Write template with specified number of items.
+
+        Return  (str)   Template name.
+        """
+
+        corpus = ZabbixCorpus(
+            seed=self.seed,
+            items=size,
+            apps=max(1, size // 50),
+            fragments=max(1, size // 500))
+        return corpus.write(templates_dir)[0]
+
+    # Run name: additional arguments for zabbixcli
+    runs = (
+        ('create', []),
+        ('unchanged', []),
+        ('forced', ['--force']),
+    )
+
+    def _run(self, server, templates_dir, cache_dir, name, args=()):
+        """
+        Apply template and return measurements.
+        """
+
+        store = server.store
+        store.calls.clear()
+        argv = ['-t', name,
+                '-s', server.url,
+                '-u', 'Admin',
+                '-p', 'zabbix',
+                '-c', cache_dir] + self.args + list(args)
+        os.environ['ZBXCLI_TEMPLATES'] = templates_dir
+
+        error = None
+        start = time.time()
+        try:
+            ZabbixCLI(argv=argv)
+        except SystemExit as e:
+            error = str(e)
+        wall = time.time() - start
+
+        return {
+            'wall': round(wall, 3),
+            'calls': sum(store.calls.values()),
+            'methods': dict(store.calls),
+            'peak_memory': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'error': error}
+
+    def run(self):
+        """
+        Run benchmark for all template sizes.
+
+        Return  (list of dict)  Measurements.
+        """
+
+        for size in self.sizes:
+            tmp = tempfile.mkdtemp(prefix='zabbixcli-benchmark-')
+            server = ZabbixFakeServer(ZabbixFakeStore(self.latency)).start()
+            try:
+                templates_dir = os.path.join(tmp, 'templates')
+                name = self._generate(templates_dir, size)
+                for run, args in self.runs:
+                    result = self._run(
+                        server,
+                        templates_dir,
+                        os.path.join(tmp, 'cache'),
+                        name,
+                        args)
+                    result.update({'size': size, 'run': run})
+                    self.results.append(result)
+                    self.report(result)
+            finally:
+                server.stop()
+                shutil.rmtree(tmp)
+
+        return self.results
+
+    def report(self, result):
+        """
+        Log measurements of single run.
+        """
+
+        log.info(
+            '%6s items, %-9s %8.3fs %6s calls %8s KB peak memory%s',
+            result['size'],
+            result['run'],
+            result['wall'],
+            result['calls'],
+            result['peak_memory'],
+            ' FAILED: {0}'.format(result['error']) if result['error'] else '')
+        for method, calls in sorted(result['methods'].items()):
+            log.debug('\t%s: %s', method, calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark zabbixcli against fake zabbix server')
+    parser.add_argument(
+        '-s',
+        '--sizes',
+        action='store',
+        type=int,
+        nargs='+',
+        default=[100, 1000, 10000],
+        help='Number of items in templates. Default: 100 1000 10000')
+    parser.add_argument(
+        '-l',
+        '--latency',
+        action='store',
+        type=float,
+        default=0,
+        help='Seconds to wait on every API call. Default: 0')
+    parser.add_argument(
+        '--seed',
+        action='store',
+        type=int,
+        default=0,
+        help='Seed to generate templates. Default: 0')
+    parser.add_argument(
+        '-o',
+        '--output',
+        action='store',
+        type=str,
+        help='Save results to JSON file')
+    parser.add_argument(
+        '-d',
+        '--debug',
+        action='store_true',
+        help='Show number of calls of each API method')
+    args, cli_args = parser.parse_known_args()
+
+    # Output of zabbixcli itself is hidden
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    log.setLevel(logging.DEBUG if args.debug else logging.INFO)
+
+    results = ZabbixBenchmark(args.sizes, args.latency, cli_args, args.seed).run()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if any(result['error'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ import json
 import logging
 import sys
 import os
+import time
 
 try:
     import argparse
@@ -10,19 +11,33 @@ except:
     raise Exception(
         "You need python version 2.7+ or installed argparse module")
 
+from apicache import ZabbixAPICache
 from app import ZabbixApp
 from autoreg import ZabbixAutoreg
+from batch import ZabbixBatch
 from defaults import ZabbixDefaults
+from dependency import ZabbixScheduler, ZabbixTemplateGraph
 from discovery import ZabbixDiscovery
-from group import ZabbixGroup
-from graph import ZabbixGraph, ZabbixGraphPrototype
-from item import ZabbixItem, ZabbixItemPrototype
-from macro import ZabbixMacro
+from group import ZabbixGroupRegistry
+from importer import ZabbixImportError, ZabbixTemplateImport
+from graph import ZabbixGraph, ZabbixGraphPrototype, graph_item_names
+from item import ZabbixItem, ZabbixItemPrototype, ZabbixItemStatus
+from macro import FINGERPRINT_MACRO, ZabbixMacros
+from metrics import ZabbixMetrics
 from object import ZabbixObject
-from template import ZabbixTemplate, ZabbixTemplateFile
+from plan import ZabbixPlan
+from profiler import ZabbixProfiler, ZabbixTimer
+from render import ZabbixRender
+from session import ZabbixSession
+from snapshot import ZabbixTemplateSnapshot
+from template import ZabbixTemplate, ZabbixTemplateCache, ZabbixTemplateIndex
 from trigger import ZabbixTrigger, ZabbixTriggerPrototype
-from trigger_action import ZabbixTriggerAction
-from zabbix.api import ZabbixAPI
+from trigger_action import ZabbixTriggerAction, action_name
+
+try:
+    from pyzabbix import ZabbixAPIException
+except ImportError:
+    from zabbix.api import ZabbixAPIException
 
 # Connect to logger object
 log = logging.getLogger(__name__)
@@ -32,12 +47,17 @@ class ZabbixCLIArguments(object):
 
     """
     Manage zabbixcli arguments
+
+    Arguments:
+    argv        (list of str)     Arguments to parse. Default: sys.argv
     """
 
-    def __init__(self):
+    description = 'Template based zabbix configuration tool'
+
+    def __init__(self, argv=None):
         # Create arguments perser object
-        self.argparser = argparse.ArgumentParser(
-            description='Template based zabbix configuration tool')
+        self.argparser = argparse.ArgumentParser(description=self.description)
+        self.argv = sys.argv[1:] if argv is None else argv
         self.args = {}
         self._loadFromEnvironment()
         self._parse()
@@ -52,19 +72,19 @@ class ZabbixCLIArguments(object):
             'ZBXCLI_USER': 'user',
             'ZBXCLI_PASS': 'pass',
             'ZBXCLI_URL': 'server',
-            'ZBXCLI_TEMPLATES': 'templates_dir',}
+            'ZBXCLI_TEMPLATES': 'templates_dir',
+            'ZBXCLI_CACHE': 'cache_dir',}
 
         # Load env variables
         for ev, arg in args_map.iteritems():
             if ev in os.environ:
                 self.args[arg] = os.environ[ev]
 
-    def _parse(self):
+    def _add_arguments(self):
         """
-        Parse CLI arguments into self.args
+        Add arguments to parser
         """
 
-        # Add arguments
         self.argparser.add_argument(
             '-t',
             '--template',
@@ -94,6 +114,71 @@ class ZabbixCLIArguments(object):
             '--only',
             action='store_true',
             help='Sync only specified templates')
+        self.argparser.add_argument(
+            '-c',
+            '--cache-dir',
+            action='store',
+            type=str,
+            help='Directory for cache files. Default: ~/.cache/zabbixcli')
+        self.argparser.add_argument(
+            '-b',
+            '--batch-size',
+            action='store',
+            type=int,
+            help='Max number of objects in one create/update request. Default: 100')
+        self.argparser.add_argument(
+            '-j',
+            '--jobs',
+            action='store',
+            type=int,
+            help='Number of templates applied at the same time. Default: 1')
+        self.argparser.add_argument(
+            '--object-jobs',
+            action='store',
+            type=int,
+            help='Number of object types applied at the same time within '
+                 'one template. Default: 1')
+        self.argparser.add_argument(
+            '--discovery-jobs',
+            action='store',
+            type=int,
+            help='Number of discovery rules applied at the same time within '
+                 'one template. Default: 1')
+        self.argparser.add_argument(
+            '-f',
+            '--force',
+            action='store_true',
+            help='Apply templates even if they weren\'t changed since last sync')
+        self.argparser.add_argument(
+            '-e',
+            '--engine',
+            action='store',
+            choices=('objects', 'import'),
+            help='Push templates object by object, or with single '
+                 'configuration.import request. Default: objects')
+        self.argparser.add_argument(
+            '-n',
+            '--plan',
+            action='store_true',
+            help='Show changes which would be made, but don\'t apply them')
+        self.argparser.add_argument(
+            '--render-only',
+            action='store_true',
+            help='Print requests for templates as JSON, without zabbix server')
+        self.argparser.add_argument(
+            '--profile',
+            action='store_true',
+            help='Show statistic of API calls and time of sync phases')
+        self.argparser.add_argument(
+            '--metrics-textfile',
+            action='store',
+            type=str,
+            help='Write metrics of run to file for Prometheus textfile collector')
+        self.argparser.add_argument(
+            '--metrics-json',
+            action='store',
+            type=str,
+            help='Append metrics of run to file as JSON line')
         self.argparser.add_argument(
             '-d',
             '--debug',
@@ -107,6 +192,13 @@ class ZabbixCLIArguments(object):
             nargs='+',
             help='Delete object from zabbix. Example: -D item "Template OS Linux" "Available memory"')
 
+    def _parse(self):
+        """
+        Parse CLI arguments into self.args
+        """
+
+        self._add_arguments()
+
         # Updage arguments from CLI
         self.args.update(
             # filter out Null arguments
@@ -114,302 +206,622 @@ class ZabbixCLIArguments(object):
                 lambda x: x[1],
                 vars(
                     # Parse arguments
-                    self.argparser.parse_args()).items()))
+                    self.argparser.parse_args(self.argv)).items()))
 
 
-class ZabbixCLI(ZabbixCLIArguments):
+class ZabbixTemplateSync(object):
 
-    def __init__(self, template=None):
-        ZabbixCLIArguments.__init__(self)
-        self._configureLogging()
-        log.debug('Parser arguments: %s', self.args)
-
-        # if no arguments, jsut print help
-        if len(sys.argv) <= 1:
-            self.argparser.print_help()
-            sys.exit()
-
-        if not self.args.get('template'):
-            sys.exit('Template should be specified.')
-
-        self.url = self.args['server']
-        try:
-            self.zapi = ZabbixAPI(
-                self.url,
-                user=self.args['user'],
-                password=self.args['pass'])
-        except:
-            log.error('Error while trying open connection to zabbix server: %s',
-                    self.url)
-
-        # If we need to delete an object and exit
-        if self.args.get('delete'):
-            template_id = self.zapi.get_id('template', self.args['delete'][1])
-            if ZabbixObject(self.zapi,
-                            {'name': self.args['delete'][2]},
-                            template_id=template_id,
-                            obj_type=self.args['delete'][0]).delete():
-                log.info(
-                    '"{2}" {0} was deleted from "{1}"'.format(
-                        *self.args['delete']))
-            else:
-                log.exit(
-                    'Error while trying to delete: "{2}" {0} from "{1}"'.format(
-                        *self.args['delete']))
-            exit()
-
-        # Set template name from __init__ params or args
-        if template:
-            self.template_name = template
-        else:
-            self.template_name = self.args.get('template')
+    """
+    Apply single template to zabbix. Linked templates should be applied
+    before.
+
+    Arguments:
+    zapi          (ZabbixAPI)           ZabbixAPI connector to send request.
+    template      (ZabbixTemplateFile)  Loaded template.
+    template_name (str)                 Name template was requested with.
+    config        (ZabbixDefaults)      Default values.
+    args          (dict)                Command line arguments.
+    timer         (ZabbixTimer)         Timer to measure sync phases.
+    groups        (ZabbixGroupRegistry) Host groups shared by templates.
+    """
 
-        # Load template from file
-        self.template = ZabbixTemplateFile(self.template_name, templates_dir=self.args.get('templates_dir'))
+    # Sync phases which should be done before phase can start. Other phases
+    # don't depend on each other and may run at the same time.
+    dependencies = {
+        'clean': [],
+        'items': ['clean'],
+        'macros': [],
+        # Graphs and triggers refer items by their keys
+        'graphs': ['items'],
+        'triggers': ['items'],
+        # Discovery rules may share applications with items
+        'discovery': ['items'],
+        'autoreg': [],
+        'alerts': [],
+    }
+
+    def __init__(self, zapi, template, template_name, config, args, timer=None, groups=None):
+        self.zapi = zapi
+        self.template = template
+        self.template_name = template_name
+        self.config = config
+        self.args = args
+        self.timer = timer or ZabbixTimer()
+        self.groups = groups
         self.template_id = None
+        self.snapshot = None
 
-        # When template loaded, set defaults and run apply process
-        if self.template:
-            self.config = ZabbixDefaults()
-            self.apply()
-
-    def _configureLogging(self):
-        """
-        Configure logging output. Format and colors.
-        """
-
-        # Set logging level
-        if self.args.get('debug'):
-            logLevel = logging.DEBUG
-        else:
-            logLevel = logging.INFO
-
-        # Set colored output
-        colors = {'reset': '\033[0m', 'green': '\x1b[32m', 'cyan': '\x1b[36m'}
-        logFormat = '{reset}{cyan}[{green}%(asctime)s{cyan}]{reset} %(message)s'.format(
-            **colors)
-        logging.basicConfig(
-            level=logLevel,
-            format=logFormat,
-            datefmt='%d/%m/%Y %H:%M:%S')
-
-    def _apply_linked_templates(self):
-        """
-        Recursive apply list of linked templates. They will applied before main
-        template will start applying.
-        """
-
-        if self.template.get('templates') and not self.args.get('only', False):
-            log.info('%s depends from:', self.template.get('name'))
-            # Show linked template list before applying
-            for linked_template in self.template.get('templates', []):
-                log.info("\t\t%s", linked_template)
-            # Apply list of linked templates
-            for linked_template in self.template.get('templates', []):
-                ZabbixCLI(template=linked_template)
+    def _phase(self, name):
+        return self.timer.phase(self.template_name, name)
 
     def _apply_template(self, template):
-        return ZabbixTemplate(self.zapi, template).apply()
+        return ZabbixTemplate(self.zapi, template, self.groups).apply()
 
-    def _apply_macro(self, macro):
-        ZabbixMacro(self.zapi, macro, self.template_id).apply()
+    def _batch(self):
+        return ZabbixBatch(self.zapi, self.args.get('batch_size', 100))
 
     def _apply_macros(self):
-        for macro in self.template.get('macros', []):
-            self._apply_macro(macro)
+        ZabbixMacros(
+            self.zapi,
+            self.template.get('macros', []),
+            self.template_id,
+            self.snapshot).apply()
 
     def _apply_app(self, app):
-        return ZabbixApp(self.zapi, app, self.template_id).apply()
+        return ZabbixApp(self.zapi, app, self.template_id, self.snapshot).apply()
 
-    def _apply_item(self, item):
-        ZabbixItem(self.zapi, item, self.config, self.template_id).apply()
+    def _apply_item(self, item, batch):
+        batch.add(ZabbixItem(self.zapi, item, self.config, self.template_id, self.snapshot))
 
-    def _apply_items(self, items, app_id):
+    def _apply_items(self, items, app_id, batch):
         for item in items:
             item['app_id'] = app_id
-            self._apply_item(item)
+            self._apply_item(item, batch)
 
-    def _apply_item_prototype(self, prototype):
-        ZabbixItemPrototype(self.zapi, prototype, self.config, self.template_id).apply()
+    def _apply_applications(self):
+        batch = self._batch()
+        apps = self.template.get('applications', {})
+        for app, items in apps.iteritems():
+            # check if disabled whole app
+            if str(items).lower() == 'disabled':
+                self._disable_app(app)
+            else:
+                app_id = self._apply_app(app)
+                self._apply_items(items, app_id, batch)
+        batch.flush()
 
-    def _apply_item_prototypes(self, discovery, app_id):
+    def _apply_item_prototype(self, prototype, batch):
+        batch.add(ZabbixItemPrototype(self.zapi, prototype, self.config, self.template_id, self.snapshot))
+
+    def _apply_item_prototypes(self, discovery, app_id, rule_id):
+        batch = self._batch()
         items = discovery.get('items', [])
-        rule_id = self.zapi.get_id(
-            'discoveryrule',
-            discovery['name'],
-            templateid=self.template_id)
         for item in items:
             item.update({'rule_id': rule_id, 'app_id': app_id})
-            self._apply_item_prototype(item)
+            self._apply_item_prototype(item, batch)
+        batch.flush()
+
+    def _apply_graph(self, graph, batch):
+        batch.add(ZabbixGraph(self.zapi, graph, self.config, self.template_id, self.snapshot))
+
+    def _resolve_graph_items(self, item_type, graphs):
+        """
+        Find ids of items used by all graphs with single request.
+        """
 
-    def _apply_graph(self, graph):
-        ZabbixGraph(self.zapi, graph, self.config, self.template_id).apply()
+        names = []
+        for graph in graphs:
+            names.extend(graph_item_names(graph))
+        self.snapshot.resolve(item_type, names)
 
     def _apply_graphs(self):
-        for graph in self.template.get('graphs', []):
-            self._apply_graph(graph)
+        batch = self._batch()
+        graphs = self.template.get('graphs', [])
+        self._resolve_graph_items('item', graphs)
+        for graph in graphs:
+            self._apply_graph(graph, batch)
+        batch.flush()
 
-    def _apply_graph_prototype(self, prototype):
-        ZabbixGraphPrototype(self.zapi, prototype, self.config, self.template_id).apply()
+    def _apply_graph_prototype(self, prototype, batch):
+        batch.add(ZabbixGraphPrototype(self.zapi, prototype, self.config, self.template_id, self.snapshot))
 
     def _apply_graph_prototypes(self, discovery):
+        batch = self._batch()
         graphs = discovery.get('graphs', [])
+        self._resolve_graph_items('itemprototype', graphs)
         for graph in graphs:
-            self._apply_graph_prototype(graph)
+            self._apply_graph_prototype(graph, batch)
+        batch.flush()
 
-    def _apply_trigger(self, trigger):
-        ZabbixTrigger(self.zapi, trigger, self.config, self.template_id).apply()
+    def _apply_trigger(self, trigger, batch):
+        batch.add(ZabbixTrigger(self.zapi, trigger, self.config, self.template_id, self.snapshot))
 
     def _apply_triggers(self):
+        batch = self._batch()
         for trigger in self.template.get('triggers', []):
-            self._apply_trigger(trigger)
+            self._apply_trigger(trigger, batch)
+        batch.flush()
 
-    def _apply_trigger_prototype(self, prototype):
-        ZabbixTriggerPrototype(self.zapi, prototype, self.config, self.template_id).apply()
+    def _apply_trigger_prototype(self, prototype, batch):
+        batch.add(ZabbixTriggerPrototype(self.zapi, prototype, self.config, self.template_id, self.snapshot))
 
     def _apply_trigger_prototypes(self, discovery):
+        batch = self._batch()
         triggers = discovery.get('triggers', [])
-        for triggers in triggers:
-            self._apply_trigger_prototype(triggers)
+        for trigger in triggers:
+            self._apply_trigger_prototype(trigger, batch)
+        batch.flush()
 
     def _apply_autoreg(self):
         autoreg = self.template.get('autoreg')
         if autoreg:
-            ZabbixAutoreg(self.zapi, self.template).apply()
+            ZabbixAutoreg(self.zapi, self.template, self.snapshot, self.groups).apply()
 
     def _apply_trigger_action(self):
         alerts = self.template.get('alerts', [])
         for alert in alerts:
-            ZabbixTriggerAction(self.zapi, alert, self.config, self.template_id, self.template_name).apply()
+            ZabbixTriggerAction(
+                self.zapi,
+                alert,
+                self.config,
+                self.template_id,
+                self.template.get('name'),
+                self.snapshot).apply()
 
     def _apply_discovery(self, discovery):
-        ZabbixDiscovery(self.zapi, discovery, self.config, self.template_id).apply()
+        return ZabbixDiscovery(self.zapi, discovery, self.config, self.template_id, self.snapshot).apply()
 
     def _apply_discoveries(self):
         discoveries = self.template.get('discovery', {})
 
-        for app, discovery in discoveries.iteritems():
+        def apply_discovery(app):
+            discovery = discoveries[app]
             app_id = self._apply_app(app)
-            self._apply_discovery(discovery)
-            self._apply_item_prototypes(discovery, app_id)
+            rule_id = self._apply_discovery(discovery)
+            self._apply_item_prototypes(discovery, app_id, rule_id)
             self._apply_graph_prototypes(discovery)
             self._apply_trigger_prototypes(discovery)
 
-    def _disable_item(self, id_):
-        ZabbixItem(self.zapi).disable(id_)
+        # Discovery rules don't depend on each other
+        errors = ZabbixScheduler(
+            collections.OrderedDict((app, []) for app in discoveries),
+            self.args.get('discovery_jobs', 1)).run(apply_discovery)
+        if errors:
+            raise next(iter(errors.values()))
 
     def _disable_app(self, app):
-        items = self.zapi.get_id(
-            'item',
-            None,
-            hostid=self.template_id,
-            app_name=app)
-        for item in items:
-            self._disable_item(item)
+        ZabbixItemStatus(
+            self.zapi,
+            self.args.get('batch_size', 100),
+            self.snapshot).disable(template_id=self.template_id, app=app)
+
+    def _import(self):
+        """
+        Push whole template with single 'configuration.import' request.
+
+        Return  (bool)  False if template should be applied object by object.
+        """
+
+        try:
+            ZabbixTemplateImport(self.zapi, self.template, self.config).apply()
+        except (ZabbixImportError, ZabbixAPIException) as e:
+            log.warning(
+                "Import of '%s' failed, apply it object by object: %s",
+                self.template_name,
+                e)
+            return False
+        return True
+
+    def _app_items(self, app):
+        """
+        Return names of current items of application.
+        """
+
+        items = ZabbixItemStatus(self.zapi, snapshot=self.snapshot).find(
+            template_id=self.template_id,
+            app=app)
+        return set(item['name'] for item in items)
 
     def clean(self):
         """
         Find and clean unused zabbix objects in current template.
         """
 
-        def getUnusedObjects(type_, o):
-            """
-            Return list of unused zabbix objects of specific type in current template
-            """
+        # Objects removed together with deleted object of specific type
+        cascade = {
+            'item': ('graph', 'trigger'),
+            'discoveryrule': ('itemprototype', 'graphprototype', 'triggerprototype'),
+        }
 
-            unused_items = []
-            # Get current objects from current template
-            current_items = self.zapi.get_id(type_, templateids=self.template_id, name=True)
-            if current_items:
-                log.debug("Current %s: %s", type_, current_items)
-                template_items = []
-                for item in o:
-                    if isinstance(item, dict):
-                        template_items.append(item.get('name'))
-                    else:
-                        template_items.append(item)
-                log.debug("Template %s: %s", type_, template_items)
-                # Filter out similar objects from zabbix and template
-                unused_items = filter(lambda x: x not in template_items, current_items)
-                log.debug("Unused %s: %s", type_, unused_items)
-            return { type_: unused_items }
-
-        def removeObjects(template_objects):
+        def names(objects):
             """
-            Remove unused zabbix objects in current template.
+            Return set of object names described in template.
             """
 
-            # Find unused objects
-            for objects in template_objects:
-                unused_objects = getUnusedObjects(*objects)
-                # Process each object type
-                for type_, objects_list in unused_objects.iteritems():
-                    # Get zabbix id for each unused object
-                    for name in objects_list:
-                        object_id = self.zapi.get_id(type_, name)
-                        if object_id:
-                            # Make function to remove object
-                            func = 'self.zapi.{object_type}.delete'.format(object_type=type_)
-                            log.info('Unused: %s \'%s\' was removed', type_, name)
-                            eval(func)(object_id)
-
-        # Init lists for objects
-        items = apps = discovery = itemprototype = graphprototype = triggerprototype = []
+            result = set()
+            for obj in objects:
+                if isinstance(obj, dict):
+                    result.add(obj.get('name'))
+                else:
+                    result.add(obj)
+            return result
+
+        # Init sets for objects
+        apps = set()
+        items = set()
+        discovery = set()
+        itemprototype = set()
+        graphprototype = set()
+        triggerprototype = set()
 
         for app, item in self.template.get('applications', {}).iteritems():
-            apps.append(app)
-            items.extend(item)
+            apps.add(app)
+            if isinstance(item, list):
+                items.update(names(item))
+            elif str(item).lower() == 'disabled':
+                # Items of disabled application are kept to be disabled
+                items.update(self._app_items(app))
         for app, disc in self.template.get('discovery', {}).iteritems():
-            apps.append(app)
-            discovery.append(disc)
-            itemprototype.extend(disc.get('items', {}))
-            graphprototype.extend(disc.get('graphs',{}))
-            triggerprototype.extend(disc.get('triggers', {}))
+            apps.add(app)
+            discovery.add(disc.get('name'))
+            itemprototype.update(names(disc.get('items', [])))
+            graphprototype.update(names(disc.get('graphs', [])))
+            triggerprototype.update(names(disc.get('triggers', [])))
 
         # Cleanup should be executed in folowing order
         obj_for_cleanup = collections.OrderedDict()
         obj_for_cleanup['application'] = apps
         obj_for_cleanup['item'] = items
-        obj_for_cleanup['usermacro'] = map(lambda x: {'name':x.get('macro')}, self.template.get('macros', []))
-        obj_for_cleanup['graph'] = self.template.get('graphs', [])
-        obj_for_cleanup['trigger'] = self.template.get('triggers', [])
+        obj_for_cleanup['graph'] = names(self.template.get('graphs', []))
+        obj_for_cleanup['trigger'] = names(self.template.get('triggers', []))
         obj_for_cleanup['discoveryrule'] = discovery
         obj_for_cleanup['itemprototype'] = itemprototype
         obj_for_cleanup['graphprototype'] = graphprototype
         obj_for_cleanup['triggerprototype'] = triggerprototype
 
-        # Make tuple (obj_type, value) to compare with
-        template_objects = []
-        for k,v in obj_for_cleanup.iteritems():
-            template_objects.append((k,v))
+        for type_, template_names in obj_for_cleanup.iteritems():
+            id_field = self.snapshot.fields[type_][1]
+            # Only objects of current template, not inherited from linked ones
+            current = dict(
+                (name, obj[id_field])
+                for name, obj in self.snapshot.objects(type_).iteritems()
+                if obj.get('templateid') in ('0', None) and
+                not obj.get('templateids'))
+            log.debug("Current %s: %s", type_, current.keys())
+            log.debug("Template %s: %s", type_, list(template_names))
+
+            unused = sorted(set(current) - template_names)
+            if not unused:
+                continue
+            log.debug("Unused %s: %s", type_, unused)
+
+            func = 'self.zapi.{object_type}.delete'.format(object_type=type_)
+            eval(func)(*[current[name] for name in unused])
+            for name in unused:
+                log.info('Unused: %s \'%s\' was removed', type_, name)
+                self.snapshot.remove(type_, name)
+
+            # Dependent objects could be removed by zabbix as well
+            self.snapshot.reset(*cascade.get(type_, ()))
+
+    def _saved_fingerprint(self):
+        """
+        Return  (str)   Fingerprint of template saved on last sync, or None.
+        """
+
+        result = self.zapi.do_request('template.get', {
+            'filter': {'host': self.template.get('name')},
+            'output': ['templateid'],
+            'selectMacros': ['macro', 'value']})['result']
+        for template in result:
+            for macro in template.get('macros', []):
+                if macro['macro'] == FINGERPRINT_MACRO:
+                    return macro['value']
+        return None
+
+    def _save_fingerprint(self, fingerprint):
+        """
+        Save fingerprint of applied template in template macro.
+        """
 
-        # Remove unused objects
-        removeObjects(template_objects)
+        macro_id = self.snapshot.get_id('usermacro', FINGERPRINT_MACRO)
+        if macro_id:
+            self.zapi.usermacro.update({'hostmacroid': macro_id, 'value': fingerprint})
+        else:
+            self.zapi.usermacro.create({
+                'hostid': self.template_id,
+                'macro': FINGERPRINT_MACRO,
+                'value': fingerprint})
 
     def apply(self):
         """
-        Apply current template to zabbix.
+        Apply current template to zabbix. Template which wasn't changed
+        since last sync is skipped.
         """
 
-        self._apply_linked_templates()
-        self.template_id = self._apply_template(self.template)
+        # Compare before sync, it changes template
+        fingerprint = self.template.fingerprint(self.config, self.template_name)
+        with self._phase('fingerprint'):
+            saved = self._saved_fingerprint()
+        if saved == fingerprint and not self.args.get('force'):
+            log.info("Unchanged: '%s', skipped", self.template.get('name'))
+            return
+
+        imported = False
+        if self.args.get('engine') == 'import':
+            with self._phase('import'):
+                imported = self._import()
+
+        with self._phase('template'):
+            self.template_id = self._apply_template(self.template)
+
+        # Fetch template objects in bulk, instead of get_id() for each of them
+        with self._phase('snapshot'):
+            self.snapshot = ZabbixTemplateSnapshot(
+                self.zapi,
+                self.template_id,
+                [action_name(self.template.get('name'), alert)
+                 for alert in self.template.get('alerts', [])])
+
+        phases = []
+        if not imported:
+            # Cleanup unused objects first
+            phases = [
+                ('clean', self.clean),
+                ('items', self._apply_applications),
+                ('macros', self._apply_macros),
+                ('graphs', self._apply_graphs),
+                ('triggers', self._apply_triggers),
+                ('discovery', self._apply_discoveries)]
+        # Actions are not part of import
+        phases += [
+            ('autoreg', self._apply_autoreg),
+            ('alerts', self._apply_trigger_action)]
+
+        # Run each phase as soon as phases it depends from are done
+        funcs = dict(phases)
+
+        def run(phase):
+            with self._phase(phase):
+                funcs[phase]()
+
+        errors = ZabbixScheduler(
+            collections.OrderedDict(
+                (phase, self.dependencies[phase]) for phase, func in phases),
+            self.args.get('object_jobs', 1)).run(run)
+        if errors:
+            raise next(iter(errors.values()))
+
+        # Nothing was changed in plan and render modes. Import deletes macros
+        # missing in template, so fingerprint is saved again after it.
+        if ((saved != fingerprint or imported) and
+                not self.args.get('plan') and
+                not self.args.get('render_only')):
+            self._save_fingerprint(fingerprint)
+        log.info("Done: '%s'", self.template.get('name'))
 
-        # Cleanup unused objects
-        self.clean()
 
-        apps = self.template.get('applications', {})
-        for app, items in apps.iteritems():
-            # check if disabled whole app
-            if str(items).lower() == 'disabled':
-                self._disable_app(app)
+class ZabbixCLI(ZabbixCLIArguments):
+
+    def __init__(self, template=None, argv=None):
+        ZabbixCLIArguments.__init__(self, argv)
+        self._configureLogging()
+        log.debug('Parser arguments: %s', self.args)
+
+        # if no arguments, jsut print help
+        if not self.argv:
+            self.argparser.print_help()
+            sys.exit()
+
+        if not self.args.get('template'):
+            sys.exit('Template should be specified.')
+
+        self._connect()
+
+        # If we need to delete an object and exit
+        if self.args.get('delete'):
+            template_id = self.zapi.get_id('template', self.args['delete'][1])
+            if ZabbixObject(self.zapi,
+                            {'name': self.args['delete'][2]},
+                            template_id=template_id,
+                            obj_type=self.args['delete'][0]).delete():
+                log.info(
+                    '"{2}" {0} was deleted from "{1}"'.format(
+                        *self.args['delete']))
             else:
-                app_id = self._apply_app(app)
-                self._apply_items(items, app_id)
-
-        self._apply_macros()
-        self._apply_graphs()
-        self._apply_triggers()
-        self._apply_discoveries()
-        self._apply_autoreg()
-        self._apply_trigger_action()
-        log.info("Done: '%s'", self.template.get('name'))
+                log.exit(
+                    'Error while trying to delete: "{2}" {0} from "{1}"'.format(
+                        *self.args['delete']))
+            exit()
+
+        # Set template name from __init__ params or args
+        if template:
+            self.template_name = template
+        else:
+            self.template_name = self.args.get('template')
+
+        # Templates which were already applied in this run
+        self.applied = set()
+
+        # Set defaults and run apply process
+        self.config = ZabbixDefaults()
+        self.apply()
+
+    def _connect(self):
+        """
+        Open session to zabbix server.
+        """
+
+        if self.args.get('render_only'):
+            # Requests are executed by in-memory fake server. Templates are
+            # applied one by one, so placeholder ids are the same each time.
+            self.render = self.zapi = ZabbixRender()
+            self.args['jobs'] = 1
+            self.args['object_jobs'] = 1
+            self.args['discovery_jobs'] = 1
+        else:
+            self.url = self.args['server']
+            try:
+                self.zapi = ZabbixSession(
+                    self.url,
+                    user=self.args['user'],
+                    password=self.args['pass'],
+                    cache_dir=self.args.get('cache_dir'))
+            except:
+                log.error('Error while trying open connection to zabbix server: %s',
+                        self.url)
+
+        # Record every request sent to zabbix server
+        self.profiler = None
+        if (self.args.get('profile') or
+                self.args.get('metrics_textfile') or
+                self.args.get('metrics_json')):
+            self.profiler = self.zapi = ZabbixProfiler(self.zapi)
+
+        # Record changes instead of applying them
+        if self.args.get('plan'):
+            self.plan = self.zapi = ZabbixPlan(self.zapi)
+
+        # Remember ids of objects which are looked up by name
+        self.zapi = ZabbixAPICache(self.zapi)
+
+    def _metrics(self):
+        """
+        Return  (ZabbixMetrics)  Metrics exporter, or None if metrics are
+                                 not requested.
+        """
+
+        textfile = self.args.get('metrics_textfile')
+        jsonl = self.args.get('metrics_json')
+        if textfile or jsonl:
+            return ZabbixMetrics(textfile, jsonl)
+
+    def _configureLogging(self):
+        """
+        Configure logging output. Format and colors.
+        """
+
+        # Set logging level
+        if self.args.get('debug'):
+            logLevel = logging.DEBUG
+        else:
+            logLevel = logging.INFO
+
+        # Set colored output
+        colors = {'reset': '\033[0m', 'green': '\x1b[32m', 'cyan': '\x1b[36m'}
+        logFormat = '{reset}{cyan}[{green}%(asctime)s{cyan}]{reset} %(message)s'.format(
+            **colors)
+        logging.basicConfig(
+            level=logLevel,
+            format=logFormat,
+            datefmt='%d/%m/%Y %H:%M:%S')
+
+    def apply(self):
+        """
+        Apply template and its linked templates to zabbix.
+        """
+
+        errors = self.apply_templates([self.template_name])
+        if errors:
+            sys.exit('Failed to apply templates: {0}'.format(
+                ', '.join(errors.keys())))
+
+    def group_names(self, graph):
+        """
+        Return names of host groups used by templates of graph.
+        """
+
+        result = set()
+        for template in graph.templates.values():
+            result.update(template.get('groups', []))
+            autoreg = template.get('autoreg')
+            if isinstance(autoreg, dict):
+                result.update(autoreg.get('add_to_group', []))
+        return result
+
+    def apply_templates(self, names, done=None):
+        """
+        Apply templates and their linked templates to zabbix. Each template
+        is applied only once, after all templates it depends from. Failure
+        of one template doesn't stop templates which don't depend from it.
+
+        Arguments:
+        names   (list of str)   Names of templates to apply.
+        done    (func)          Called with name of each applied template.
+
+        Return  (dict)  Errors by names of failed templates.
+        """
+
+        start = time.time()
+        self.timer = ZabbixTimer()
+        if self.profiler:
+            self.profiler.reset()
+        # Worker applies templates many times in the same process
+        ZabbixTemplateCache.reset_stats()
+        ZabbixTemplateIndex.reset()
+        self.zapi.reset_stats()
+
+        # Load templates and resolve dependencies
+        with self.timer.phase(None, 'load'):
+            graph = ZabbixTemplateGraph(
+                names,
+                templates_dir=self.args.get('templates_dir'),
+                only=self.args.get('only', False),
+                cache_dir=self.args.get('cache_dir'))
+        try:
+            order = graph.order()
+        except ValueError as e:
+            sys.exit(str(e))
+
+        # Groups of all templates are resolved together on first use
+        groups = ZabbixGroupRegistry(self.zapi, self.group_names(graph))
+
+        # Number of created, updated, deleted and unchanged objects
+        changes = {}
+
+        def apply_template(name):
+            sync = ZabbixTemplateSync(
+                self.zapi,
+                graph.templates[name],
+                graph.names[name],
+                self.config,
+                self.args,
+                self.timer,
+                groups)
+            try:
+                sync.apply()
+            finally:
+                if sync.snapshot:
+                    changes[name] = sync.snapshot.changes
+            self.applied.add(name)
+            if done:
+                done(graph.names[name])
+
+        # Independent templates may be applied at the same time
+        dependencies = collections.OrderedDict(
+            (name, graph.dependencies[name])
+            for name in order if name not in self.applied)
+        errors = ZabbixScheduler(
+            dependencies,
+            self.args.get('jobs', 1)).run(apply_template)
+
+        self.zapi.report()
+        if self.args.get('plan'):
+            self.plan.report()
+        if self.args.get('profile'):
+            self.profiler.report(self.timer)
+        if self.args.get('render_only'):
+            self.render.write(sys.stdout)
+
+        metrics = self._metrics()
+        if metrics:
+            metrics.collect(
+                time.time() - start,
+                changes,
+                errors,
+                self.timer,
+                self.profiler,
+                self.zapi)
+            metrics.write()
+
+        return errors
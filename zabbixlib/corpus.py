@@ -0,0 +1,257 @@
+import argparse
+import logging
+import os
+import random
+import yaml
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixCorpus(object):
+
+    """
+    Generate synthetic zabbix templates for scale testing.
+
+    Templates are written in the same layout as real ones: init.yaml with
+    name, groups, linked templates, macros and alerts, and fragments with
+    applications, graphs, triggers and discovery rules. Templates are
+    arranged in levels, each template links templates of previous level.
+    Result depends only from parameters, so the same seed always gives the
+    same templates.
+
+    Arguments:
+    seed        (int)             Seed of random generator.
+    templates   (int)             Number of templates on each level.
+    depth       (int)             Number of levels of linked templates.
+    fanout      (int)             Number of templates linked by template.
+    items       (int)             Number of items in template.
+    apps        (int)             Number of applications in template.
+    fragments   (int)             Number of files to split applications to.
+    discoveries (int)             Number of discovery rules in template.
+    prototypes  (int)             Number of item prototypes in discovery rule.
+    macros      (int)             Number of macros in template.
+    """
+
+    # Item parameters to choose from
+    return_types = ('float', 'numeric', 'char', 'text')
+    units = ('', '%', 'B', 'bps', 's')
+    intervals = (30, 60, 300)
+    warn_levels = ('info', 'warning', 'average', 'high', 'disaster')
+    colors = ('1A7C11', 'F63100', '2774A4', 'A54F10', 'FC6EA3', '6C59DC')
+
+    def __init__(
+            self,
+            seed=0,
+            templates=1,
+            depth=1,
+            fanout=2,
+            items=100,
+            apps=5,
+            fragments=3,
+            discoveries=1,
+            prototypes=5,
+            macros=3):
+        self.random = random.Random(seed)
+        self.templates = templates
+        self.depth = depth
+        self.fanout = fanout
+        self.items = items
+        self.apps = apps
+        self.fragments = fragments
+        self.discoveries = discoveries
+        self.prototypes = prototypes
+        self.macros = macros
+
+    def _choice(self, seq):
+        # random.choice() gives different results on python 2 and 3
+        return seq[int(self.random.random() * len(seq))]
+
+    def _item(self, name, key):
+        result = {
+            'name': name,
+            'key': key,
+            'return_type': self._choice(self.return_types),
+            'interval': self._choice(self.intervals),
+        }
+        if result['return_type'] in ('float', 'numeric'):
+            units = self._choice(self.units)
+            if units:
+                result['units'] = units
+        return result
+
+    def _graph(self, name, items):
+        return {
+            'name': name,
+            'items': [
+                {'item': item['name'], 'color': self._choice(self.colors)}
+                for item in items],
+        }
+
+    def _trigger(self, name, template_name, item):
+        return {
+            'name': name,
+            'expression': '{{{0}:{1}.last()}}>{2}'.format(
+                template_name,
+                item['key'],
+                int(self.random.random() * 100)),
+            'warn_level': self._choice(self.warn_levels),
+        }
+
+    def _applications(self, name, prefix):
+        """
+        Return applications with items, graphs and triggers for them.
+        """
+
+        applications = {}
+        graphs = []
+        triggers = []
+        for i in range(self.items):
+            app = '{0} app {1}'.format(prefix, i % self.apps)
+            item = self._item(
+                '{0} item {1}'.format(prefix, i),
+                '{0}.item[{1}]'.format(prefix.lower().replace(' ', '_'), i))
+            applications.setdefault(app, []).append(item)
+
+        for app, items in sorted(applications.items()):
+            for i in range(0, len(items), 4):
+                graphs.append(self._graph(
+                    '{0} graph {1}'.format(app, i // 4),
+                    items[i:i + 4]))
+            for item in items[::5]:
+                triggers.append(self._trigger(
+                    'Problem with {0}'.format(item['name']),
+                    name,
+                    item))
+
+        return applications, graphs, triggers
+
+    def _discovery(self, name, prefix):
+        result = {}
+        for i in range(self.discoveries):
+            rule = '{0} discovery {1}'.format(prefix, i)
+            macro = '{#NAME}'
+            # Prototype names and keys are unique within template
+            items = [
+                self._item(
+                    '{0} prototype {1} on {2}'.format(rule, j, macro),
+                    '{0}.prototype[{1},{2},{3}]'.format(
+                        prefix.lower().replace(' ', '_'), i, j, macro))
+                for j in range(self.prototypes)]
+            result['{0} app'.format(rule)] = {
+                'name': rule,
+                'key': '{0}.discovery[{1}]'.format(
+                    prefix.lower().replace(' ', '_'), i),
+                'filter': {'macro': macro, 'regexp': '.*'},
+                'items': items,
+                'graphs': [self._graph('{0} graph on {1}'.format(rule, macro), items[:4])],
+                'triggers': [
+                    self._trigger('Problem with {0}'.format(item['name']), name, item)
+                    for item in items[:2]],
+            }
+        return result
+
+    def _dump(self, path, data, name=None):
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(path, 'w') as f:
+            # Template name should be in first line of file
+            if name:
+                f.write('name: "{0}"\n'.format(name))
+            if data:
+                yaml.safe_dump(data, f, default_flow_style=False)
+
+    def template(self, templates_dir, name, linked=None):
+        """
+        Write single template.
+        """
+
+        prefix = name.replace('Template ', '')
+        basedir = os.path.join(templates_dir, name)
+        applications, graphs, triggers = self._applications(name, prefix)
+
+        init = {
+            'groups': ['Templates'],
+            'macros': [
+                {'macro': '{{$BENCH_{0}_{1}}}'.format(
+                    prefix.upper().replace(' ', '_'), i),
+                 'value': str(int(self.random.random() * 1000))}
+                for i in range(self.macros)],
+        }
+        if linked:
+            init['templates'] = linked
+            init['alerts'] = [{
+                'name': 'Notify',
+                'do': [{'to_group': 'Zabbix administrators'}]}]
+        self._dump(os.path.join(basedir, 'init.yaml'), init, name)
+
+        apps = sorted(applications)
+        fragments = max(1, min(self.fragments, len(apps)))
+        for i in range(fragments):
+            self._dump(
+                os.path.join(basedir, 'apps', 'part{0}.yaml'.format(i)),
+                {'applications': dict(
+                    (app, applications[app]) for app in apps[i::fragments])})
+
+        self._dump(os.path.join(basedir, 'graphs.yaml'), {'graphs': graphs})
+        self._dump(os.path.join(basedir, 'triggers.yaml'), {'triggers': triggers})
+        if self.discoveries:
+            self._dump(
+                os.path.join(basedir, 'discovery.yaml'),
+                {'discovery': self._discovery(name, prefix)})
+
+    def write(self, templates_dir):
+        """
+        Write all templates.
+
+        Return  (list of str)  Names of templates on last level, which link
+                               all other templates.
+        """
+
+        names = []
+        for level in range(self.depth):
+            previous = names
+            names = []
+            for i in range(self.templates):
+                name = 'Template Level{0} Number{1}'.format(level, i)
+                linked = None
+                if previous:
+                    linked = sorted(set(
+                        self._choice(previous) for j in range(self.fanout)))
+                self.template(templates_dir, name, linked)
+                names.append(name)
+        log.info('%s templates written to %s', self.templates * self.depth, templates_dir)
+        return names
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic zabbix templates')
+    parser.add_argument('templates_dir', help='Directory to write templates')
+    for arg, default, help_ in (
+            ('seed', 0, 'Seed of random generator'),
+            ('templates', 1, 'Number of templates on each level'),
+            ('depth', 1, 'Number of levels of linked templates'),
+            ('fanout', 2, 'Number of templates linked by template'),
+            ('items', 100, 'Number of items in template'),
+            ('apps', 5, 'Number of applications in template'),
+            ('fragments', 3, 'Number of files to split applications to'),
+            ('discoveries', 1, 'Number of discovery rules in template'),
+            ('prototypes', 5, 'Number of item prototypes in discovery rule'),
+            ('macros', 3, 'Number of macros in template')):
+        parser.add_argument(
+            '--{0}'.format(arg),
+            action='store',
+            type=int,
+            default=default,
+            help='{0}. Default: {1}'.format(help_, default))
+    args = vars(parser.parse_args())
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    templates_dir = args.pop('templates_dir')
+    for name in ZabbixCorpus(**args).write(templates_dir):
+        log.info(name)
+
+
+if __name__ == '__main__':
+    main()
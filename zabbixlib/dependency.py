@@ -0,0 +1,201 @@
+import collections
+import logging
+from multiprocessing.pool import ThreadPool
+from template import ZabbixTemplateFile
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixTemplateGraph(object):
+
+    """
+    Dependency graph of linked templates.
+
+    Each template is loaded only once, even if several templates link it,
+    and templates are returned in order they should be applied: linked
+    templates go before templates which link them.
+
+    Arguments:
+    names         (list of str)   Names of templates to apply.
+    templates_dir (str)           Directory that store zabbix templates.
+    only          (bool)          Don't follow linked templates.
+    cache_dir     (str)           Directory to store parsed template files.
+    """
+
+    def __init__(self, names, templates_dir=None, only=False, cache_dir=None):
+        self.templates_dir = templates_dir
+        self.cache_dir = cache_dir
+        self.only = only
+        # Loaded templates by their names
+        self.templates = collections.OrderedDict()
+        # Name which template was requested with
+        self.names = {}
+        # Linked templates, which are part of graph
+        self.dependencies = {}
+        # Requested name to template name
+        self.aliases = {}
+
+        for name in names:
+            self._add(name)
+
+        for name, template in self.templates.iteritems():
+            self.dependencies[name] = [
+                linked for linked in template.get('templates', [])
+                if linked in self.templates]
+
+    def _add(self, name):
+        """
+        Load template and recursively its linked templates.
+
+        Return  (str)   Template name, or None if template wasn't found.
+        """
+
+        if name in self.aliases:
+            return self.aliases[name]
+
+        template = ZabbixTemplateFile(
+            name,
+            templates_dir=self.templates_dir,
+            cache_dir=self.cache_dir)
+        if not template:
+            log.warning("Template '%s' not found, it will not be applied.", name)
+            self.aliases[name] = None
+            return None
+
+        result = template.get('name')
+        self.aliases[name] = result
+        if result in self.templates:
+            return result
+
+        self.templates[result] = template
+        self.names[result] = name
+
+        if template.get('templates') and not self.only:
+            log.info('%s depends from:', result)
+            # Show linked template list before loading
+            for linked_template in template.get('templates', []):
+                log.info("\t\t%s", linked_template)
+            for linked_template in template.get('templates', []):
+                self._add(linked_template)
+
+        return result
+
+    def order(self):
+        """
+        Return template names in order they should be applied.
+
+        Raise ValueError if templates have circular dependency.
+        """
+
+        result = []
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visit':
+                cycle = path[path.index(name):] + [name]
+                raise ValueError(
+                    'Circular dependency of templates: {0}'.format(
+                        ' -> '.join(cycle)))
+            state[name] = 'visit'
+            for linked in self.dependencies[name]:
+                visit(linked, path + [name])
+            state[name] = 'done'
+            result.append(name)
+
+        for name in self.templates:
+            visit(name, [])
+
+        return result
+
+
+class ZabbixScheduler(object):
+
+    """
+    Run tasks on bounded pool of threads. Task starts only when all tasks
+    it depends from are successfully done.
+
+    Arguments:
+    dependencies  (OrderedDict)   Task name to list of names it depends from.
+    jobs          (int)           Max number of tasks running at same time.
+    """
+
+    def __init__(self, dependencies, jobs=1):
+        self.dependencies = dependencies
+        self.jobs = jobs
+
+    def run(self, func):
+        """
+        Call func(name) for each task.
+
+        Return  (OrderedDict)   Errors of failed tasks by task name. Tasks
+                                which depend from failed one are not run.
+
+        SystemExit or KeyboardInterrupt raised by task is raised again, when
+        running tasks are finished.
+        """
+
+        errors = collections.OrderedDict()
+        done = queue.Queue()
+        # Dependencies which are not finished yet, for each not started task
+        pending = collections.OrderedDict(
+            (name, set(deps) & set(self.dependencies))
+            for name, deps in self.dependencies.iteritems())
+
+        def task(name):
+            error = None
+            try:
+                func(name)
+            except BaseException as e:
+                log.debug('Task %s failed', name, exc_info=True)
+                error = e
+            finally:
+                # Task always reports back, or run() would wait forever
+                done.put((name, error))
+
+        def skip(failed):
+            for name, deps in pending.items():
+                if failed in deps and name in pending:
+                    pending.pop(name)
+                    log.error("Skip '%s', because '%s' failed", name, failed)
+                    errors[name] = Exception(
+                        "Dependency '{0}' failed".format(failed))
+                    skip(name)
+
+        pool = ThreadPool(self.jobs)
+        running = 0
+        try:
+            while True:
+                # Start all tasks which have nothing to wait
+                for name, deps in pending.items():
+                    if not deps:
+                        pending.pop(name)
+                        pool.apply_async(task, (name,))
+                        running += 1
+
+                if not running:
+                    break
+
+                name, error = done.get()
+                running -= 1
+                if error is not None and not isinstance(error, Exception):
+                    # SystemExit or KeyboardInterrupt stops whole run
+                    raise error
+                if error:
+                    log.error("Failed: '%s': %s", name, error)
+                    errors[name] = error
+                    skip(name)
+                else:
+                    for deps in pending.values():
+                        deps.discard(name)
+        finally:
+            pool.close()
+            pool.join()
+
+        return errors
@@ -0,0 +1,136 @@
+import re
+
+# Time units which zabbix accepts in intervals
+TIME_SUFFIXES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+# Fields which values are intervals, they may be set with time suffix
+TIME_FIELDS = ('delay', 'esc_period', 'history', 'lifetime', 'trends')
+
+# Fields which values are numbers. Ids are numbers as well, all other
+# fields are compared as strings.
+NUMERIC_FIELDS = (
+    'authtype', 'calc_fnc', 'conditiontype', 'data_type', 'default_msg',
+    'delta', 'drawtype', 'esc_step_from', 'esc_step_to', 'evaltype',
+    'eventsource', 'formula', 'graphtype', 'height', 'inventory_link',
+    'multiplier', 'operationtype', 'operator', 'percent_left',
+    'percent_right', 'priority', 'recovery_msg', 'show_3d', 'show_legend',
+    'show_triggers', 'show_work_period', 'sorted', 'status', 'type',
+    'value_type', 'width', 'yaxismax', 'yaxismin', 'yaxisside',
+    'ymax_type', 'ymin_type')
+
+
+def numeric(field):
+    """
+    Check if values of field should be compared as numbers.
+    """
+
+    return bool(field) and (
+        field in TIME_FIELDS or
+        field in NUMERIC_FIELDS or
+        field.endswith('id') or
+        field.endswith('ids'))
+
+
+def normalize(value, field=None):
+    """
+    Convert scalar value to form which can be compared with value returned
+    by zabbix server (zabbix returns all values as strings).
+
+    Values of numeric fields are converted to numbers, values of other
+    fields are converted to strings, and are compared exactly.
+
+    Example:
+      normalize(60, 'delay') == normalize('1m', 'delay') == 60.0
+      normalize('1.10', 'name') != normalize('1.1', 'name')
+    """
+
+    if value is None:
+        return u''
+    if isinstance(value, bool):
+        value = int(value)
+
+    if not numeric(field):
+        if isinstance(value, basestring):
+            return value
+        return u'{0}'.format(value)
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    if not isinstance(value, basestring):
+        return value
+
+    value = value.strip()
+    match = re.match(r'^(\d+)([smhdw])$', value)
+    if match and field in TIME_FIELDS:
+        return float(match.group(1)) * TIME_SUFFIXES[match.group(2)]
+    return value
+
+
+def equal(new, current, nested=False, field=None):
+    """
+    Check if value from request is equal to value returned by zabbix.
+
+    Dictionaries are compared by keys of the new value only. Nested objects
+    returned by zabbix contain all stored fields, so a key which zabbix
+    doesn't return is ignored there. Lists are compared regardless of order.
+    Single id is equal to object which contain only that id, like
+    [12] and [{'applicationid': '12'}].
+
+    Arguments:
+    new     (any)     Value from request.
+    current (any)     Value returned by zabbix.
+    nested  (bool)    Value is part of other value.
+    field   (str)     Name of field, which defines how values are compared.
+    """
+
+    if isinstance(new, dict):
+        if not isinstance(current, dict):
+            return False
+        for k, v in new.iteritems():
+            if k not in current:
+                if nested:
+                    continue
+                return False
+            if not equal(v, current[k], True, k):
+                return False
+        return True
+
+    if isinstance(new, (list, tuple)):
+        if not isinstance(current, (list, tuple)) or len(new) != len(current):
+            return False
+        current = list(current)
+        for n in new:
+            for c in current:
+                if equal(n, c, True, field):
+                    current.remove(c)
+                    break
+            else:
+                return False
+        return True
+
+    if isinstance(current, dict):
+        ids = [(k, v) for k, v in current.iteritems() if k.endswith('id')]
+        return len(ids) == 1 and equal(new, ids[0][1], True, ids[0][0])
+
+    if isinstance(current, (list, tuple)):
+        return False
+
+    return normalize(new, field) == normalize(current, field)
+
+
+def diff(req, current):
+    """
+    Return fields of request which differ from current state of object.
+
+    Arguments:
+    req     (dict)    Request for object changes.
+    current (dict)    Object returned by zabbix server.
+
+    Return  (dict)    Changed fields with their new values.
+    """
+
+    return dict(
+        (k, v) for k, v in req.iteritems()
+        if k not in current or not equal(v, current[k], field=k))
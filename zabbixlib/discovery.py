@@ -14,14 +14,16 @@ class ZabbixDiscovery(ZabbixObject):
     obj         (dict)            Dictionary discribed zabbix discovery template.
     defaults    (ZabbixDefaults)  Default values.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, defaults, template_id):
+    def __init__(self, zapi, obj, defaults, template_id, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.defaults = defaults
         self.template_id = template_id
         self.obj_type = 'discoveryrule'
+        self.snapshot = snapshot
         ZabbixObject(self.zapi, self.obj, self.template_id)
 
     def _create_request(self):
@@ -61,3 +63,42 @@ class ZabbixDiscovery(ZabbixObject):
                     {}).get('regexp')),
         }
         return result
+
+    def _filter_changed(self, current):
+        """
+        Compare filter of template with filter returned by zabbix, which is
+        object with list of conditions.
+        """
+
+        filter_ = self.obj.get('filter', {})
+        expected = []
+        if filter_.get('macro'):
+            expected.append((filter_['macro'], filter_.get('regexp') or ''))
+        conditions = [
+            (condition.get('macro'), condition.get('value') or '')
+            for condition in current.get('conditions', [])]
+        return conditions != expected
+
+    def _changes(self, name, req):
+        """
+        Compare request with current state of discovery rule.
+        """
+
+        current = self.snapshot.get(self.obj_type, name) if self.snapshot else None
+        if current and isinstance(current.get('filter'), dict):
+            if not self._filter_changed(current['filter']):
+                req = dict((k, v) for k, v in req.iteritems() if k != 'filter')
+        return ZabbixObject._changes(self, name, req)
+
+    def apply(self):
+        """
+        Push discovery rule to zabbix server.
+
+        Return  (int)   Id of discovery rule.
+        """
+
+        result = ZabbixObject.apply(self)
+        if result:
+            # Id of created or updated rule is returned by zabbix
+            return int(result['itemids'][0])
+        return self._get_id(self.obj_type, self._get_name(), hostid=self.template_id)
@@ -0,0 +1,562 @@
+import argparse
+import copy
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixFakeError(Exception):
+
+    """
+    JSON-RPC error returned by fake zabbix server.
+    """
+
+    def __init__(self, message, data=''):
+        Exception.__init__(self, message)
+        self.error = {'code': -32602, 'message': message, 'data': data}
+
+
+class ZabbixFakeStore(object):
+
+    """
+    In-memory implementation of the subset of zabbix API used by zabbixlib:
+    get, create, update and delete methods of zabbix objects, login and
+    configuration.import.
+    Number of calls of each method is counted in calls attribute.
+
+    Arguments:
+    latency     (float)     Seconds to sleep on every call.
+    """
+
+    # object type: (id field, name field)
+    objects = {
+        'action': ('actionid', 'name'),
+        'application': ('applicationid', 'name'),
+        'discoveryrule': ('itemid', 'name'),
+        'graph': ('graphid', 'name'),
+        'graphprototype': ('graphid', 'name'),
+        'hostgroup': ('groupid', 'name'),
+        'item': ('itemid', 'name'),
+        'itemprototype': ('itemid', 'name'),
+        'mediatype': ('mediatypeid', 'description'),
+        'template': ('templateid', 'name'),
+        'trigger': ('triggerid', 'description'),
+        'triggerprototype': ('triggerid', 'description'),
+        'user': ('userid', 'alias'),
+        'usergroup': ('usrgrpid', 'name'),
+        'usermacro': ('hostmacroid', 'macro'),
+    }
+
+    # Objects removed together with their parent
+    cascade = {
+        'template': ('application', 'item', 'discoveryrule', 'usermacro'),
+        'discoveryrule': ('itemprototype',),
+        'item': ('graph', 'trigger'),
+        'itemprototype': ('graphprototype', 'triggerprototype'),
+    }
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.ids = itertools.count(1)
+        self.calls = {}
+        self.sessions = set()
+        self.connections = 0
+        self.tables = dict((type_, {}) for type_ in self.objects)
+        self._create('mediatype', {'description': 'Email'})
+        self._create('user', {'alias': 'Admin'})
+        self._create('usergroup', {'name': 'Zabbix administrators'})
+
+    def _create(self, type_, obj):
+        id_field, name_field = self.objects[type_]
+        obj = copy.deepcopy(obj)
+        obj[id_field] = str(next(self.ids))
+        obj.setdefault('templateid', '0')
+        if type_ == 'template':
+            obj.setdefault('name', obj.get('host'))
+        self.tables[type_][obj[id_field]] = obj
+        return obj[id_field]
+
+    def _hostids(self, type_, obj):
+        """
+        Return ids of hosts (templates) which object belong to.
+        """
+
+        if 'hostid' in obj:
+            return [str(obj['hostid'])]
+        if type_ in ('trigger', 'triggerprototype'):
+            hosts = re.findall(r'{([^:{}]+):', obj.get('expression', ''))
+            return [t['templateid'] for t in self.tables['template'].values()
+                    if t['host'] in hosts]
+        if type_ in ('graph', 'graphprototype'):
+            result = []
+            for gitem in obj.get('gitems', []):
+                for table in ('item', 'itemprototype'):
+                    item = self.tables[table].get(str(gitem.get('itemid')))
+                    if item:
+                        result.append(str(item['hostid']))
+            return result
+        if type_ == 'template':
+            return [obj['templateid']]
+        return []
+
+    def _match(self, type_, obj, params):
+        for field, value in params.get('filter', {}).items():
+            if value is None:
+                continue
+            values = value if isinstance(value, list) else [value]
+            if field == 'hostid':
+                if not set(map(str, values)) & set(self._hostids(type_, obj)):
+                    return False
+            elif str(obj.get(field)) not in map(str, values):
+                return False
+        for field, value in params.get('search', {}).items():
+            if str(value).replace('*', '') not in str(obj.get(field, '')):
+                return False
+        id_field = self.objects[type_][0]
+        if params.get(id_field + 's') is not None:
+            if obj[id_field] not in map(str, params[id_field + 's']):
+                return False
+        for key in ('hostids', 'templateids'):
+            if params.get(key) is not None:
+                values = params[key]
+                values = values if isinstance(values, list) else [values]
+                if not set(map(str, values)) & set(self._hostids(type_, obj)):
+                    return False
+        if params.get('application'):
+            names = [self.tables['application'].get(str(a), {}).get('name')
+                     for a in obj.get('applications', [])]
+            if params['application'] not in names:
+                return False
+        if params.get('discoveryids'):
+            if str(obj.get('ruleid')) not in map(str, params['discoveryids']):
+                return False
+        return True
+
+    def _filter(self, filter_):
+        """
+        Convert filter of discovery rule to object, which zabbix returns.
+        """
+
+        if isinstance(filter_, dict):
+            return filter_
+        conditions = []
+        macro, _, value = (filter_ or '').partition(':')
+        if macro and macro != 'None':
+            conditions.append({
+                'macro': macro,
+                'value': '' if value == 'None' else value,
+                'operator': '8',
+                'formulaid': 'A'})
+        return {'evaltype': '0', 'formula': '', 'conditions': conditions}
+
+    def _output(self, type_, obj, params):
+        result = copy.deepcopy(obj)
+        if params.get('selectApplications') and 'applications' in obj:
+            result['applications'] = [{'applicationid': str(a)} for a in obj['applications']]
+        if params.get('selectGraphItems') and 'gitems' in obj:
+            result['gitems'] = [dict((k, str(v)) for k, v in g.items()) for g in obj['gitems']]
+        if params.get('selectParentTemplates') and type_ == 'template':
+            result['parentTemplates'] = [{'templateid': str(t)} for t in obj.get('templates', [])]
+        if params.get('selectGroups') and type_ == 'template':
+            result['groups'] = [dict((k, str(v)) for k, v in g.items()) for g in obj.get('groups', [])]
+        if params.get('selectMacros') and type_ == 'template':
+            result['macros'] = [m for m in self.tables['usermacro'].values()
+                                if str(m['hostid']) == obj['templateid']]
+        # Like zabbix, prototypes don't return their rule, and filter of
+        # rule is returned as object only on request
+        if type_ == 'itemprototype':
+            result.pop('ruleid', None)
+        if type_ == 'discoveryrule':
+            filter_ = result.pop('filter', None)
+            if params.get('selectFilter'):
+                result['filter'] = self._filter(filter_)
+        output = params.get('output', 'extend')
+        if isinstance(output, list):
+            id_field = self.objects[type_][0]
+            result = dict((k, v) for k, v in result.items() if k in output or k == id_field
+                          or k in ('applications', 'gitems', 'macros', 'parentTemplates', 'groups',
+                                   'filter'))
+        for k, v in list(result.items()):
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                result[k] = str(v)
+        return result
+
+    def _refers(self, type_, obj, child_type, child):
+        """
+        Check if child object refers to object, so it's removed with it.
+        """
+
+        id_ = obj[self.objects[type_][0]]
+        if type_ == 'template':
+            return str(child.get('hostid')) == id_
+        if type_ == 'discoveryrule':
+            return str(child.get('ruleid')) == id_
+        if child_type in ('graph', 'graphprototype'):
+            return id_ in [str(g.get('itemid')) for g in child.get('gitems', [])]
+        host = self.tables['template'].get(str(obj.get('hostid')), {}).get('host')
+        return '{{{0}:{1}.'.format(host, obj.get('key_')) in child.get('expression', '')
+
+    def _delete(self, type_, ids):
+        for id_ in map(str, ids):
+            obj = self.tables[type_].pop(id_, None)
+            if obj is None:
+                raise ZabbixFakeError('No permissions to referred object or it does not exist!')
+            for child_type in self.cascade.get(type_, ()):
+                children = [child_id for child_id, child in self.tables[child_type].items()
+                            if self._refers(type_, obj, child_type, child)]
+                self._delete(child_type, children)
+
+    def _sync(self, type_, current, objs, rule):
+        """
+        Create, update and delete objects of import according to rule.
+
+        Arguments:
+        type_       (str)       Object type.
+        current     (dict)      Existing objects by key.
+        objs        (dict)      Imported objects by key.
+        rule        (dict)      Import rule of object type.
+
+        Return  (dict)  Ids of imported objects by key.
+        """
+
+        id_field = self.objects[type_][0]
+        result = {}
+        for key, obj in objs.items():
+            if key in current:
+                if rule.get('updateExisting'):
+                    current[key].update(obj)
+                result[key] = current[key][id_field]
+            elif rule.get('createMissing'):
+                result[key] = self._create(type_, obj)
+        if rule.get('deleteMissing'):
+            self._delete(type_, [
+                obj[id_field] for key, obj in current.items()
+                if key not in objs and obj[id_field] in self.tables[type_]])
+        return result
+
+    def _own(self, type_, hostid):
+        """
+        Return objects of template, not inherited from linked ones.
+        """
+
+        return [obj for obj in self.tables[type_].values()
+                if hostid in self._hostids(type_, obj) and obj.get('templateid', '0') == '0']
+
+    def _import_items(self, type_, hostid, items, rule, apps, ruleid=None):
+        objs = {}
+        for item in items:
+            obj = dict((k, v) for k, v in item.items() if k not in (
+                'key', 'applications', 'application_prototypes', 'item_prototypes',
+                'trigger_prototypes', 'graph_prototypes', 'host_prototypes'))
+            obj.update({'key_': item['key'], 'hostid': hostid})
+            if 'applications' in item:
+                obj['applications'] = [apps[app['name']] for app in item['applications']]
+            if ruleid:
+                obj['ruleid'] = ruleid
+            objs[item['key']] = obj
+        current = dict(
+            (obj['key_'], obj) for obj in self._own(type_, hostid)
+            if str(obj.get('ruleid')) == str(ruleid))
+        return self._sync(type_, current, objs, rule)
+
+    def _import_triggers(self, type_, hostids, triggers, rule):
+        objs = {}
+        for trigger in triggers:
+            obj = dict((k, v) for k, v in trigger.items()
+                       if k not in ('name', 'description', 'dependencies'))
+            obj.update({'description': trigger['name'], 'comments': trigger.get('description', '')})
+            objs[trigger['name']] = obj
+        current = {}
+        for hostid in hostids:
+            current.update((obj['description'], obj) for obj in self._own(type_, hostid))
+        return self._sync(type_, current, objs, rule)
+
+    def _import_graphs(self, type_, hostids, graphs, rule):
+        hosts = dict((t['host'], t['templateid']) for t in self.tables['template'].values())
+        items = {}
+        for table in ('item', 'itemprototype'):
+            for item in self.tables[table].values():
+                items.setdefault((str(item['hostid']), item['key_']), item[self.objects[table][0]])
+        objs = {}
+        for graph in graphs:
+            obj = dict((k, v) for k, v in graph.items() if k not in (
+                'type', 'graph_items', 'ymin_type_1', 'ymax_type_1', 'ymin_item_1', 'ymax_item_1'))
+            obj.update({
+                'graphtype': graph.get('type', '0'),
+                'ymin_type': graph.get('ymin_type_1', '0'),
+                'ymax_type': graph.get('ymax_type_1', '0'),
+                'gitems': []})
+            for gitem in graph.get('graph_items', []):
+                itemid = items.get((hosts.get(gitem['item']['host']), gitem['item']['key']))
+                if not itemid:
+                    raise ZabbixFakeError('Item "{0}" does not exist.'.format(gitem['item']['key']))
+                gitem = dict((k, v) for k, v in gitem.items() if k not in ('item', 'sortorder'))
+                gitem.update({'itemid': itemid})
+                obj['gitems'].append(gitem)
+            objs[graph['name']] = obj
+        current = {}
+        for hostid in hostids:
+            current.update((obj['name'], obj) for obj in self._own(type_, hostid))
+        return self._sync(type_, current, objs, rule)
+
+    def _import(self, params):
+        """
+        Import templates in zabbix 3.0 format, subset used by zabbixlib:
+        templates with groups, linked templates, macros, applications,
+        items and discovery rules, and triggers and graphs.
+        """
+
+        if params.get('format') != 'json':
+            raise ZabbixFakeError('Unsupported import format.')
+        rules = params.get('rules', {})
+        data = json.loads(params['source'])['zabbix_export']
+
+        groups = dict((g['name'], g['groupid']) for g in self.tables['hostgroup'].values())
+        for group in data.get('groups', []):
+            if group['name'] not in groups:
+                if not rules.get('groups', {}).get('createMissing'):
+                    raise ZabbixFakeError('Group "{0}" does not exist.'.format(group['name']))
+                groups[group['name']] = self._create('hostgroup', {'name': group['name']})
+
+        hostids = []
+        for template in data.get('templates', []):
+            hosts = dict((t['host'], t) for t in self.tables['template'].values())
+            links = [hosts[t['name']]['templateid'] for t in template.get('templates', [])
+                     if t['name'] in hosts]
+            obj = {
+                'host': template['template'],
+                'name': template.get('name', template['template']),
+                'groups': [{'groupid': groups[g['name']]} for g in template.get('groups', [])],
+            }
+            current = dict((t['host'], t) for t in self.tables['template'].values()
+                           if t['host'] == template['template'])
+            if template['template'] in current:
+                # New links are added, existing ones are kept
+                links = sorted(set(links) | set(
+                    str(t) for t in current[template['template']].get('templates', [])))
+            obj['templates'] = links
+            hostid = self._sync('template', current, {template['template']: obj},
+                                rules.get('templates', {})).get(template['template'])
+            if not hostid:
+                continue
+            hostids.append(hostid)
+
+            self._sync(
+                'usermacro',
+                dict((m['macro'], m) for m in self._own('usermacro', hostid)),
+                dict((m['macro'], dict(m, hostid=hostid)) for m in template.get('macros', [])),
+                {'createMissing': True, 'updateExisting': True, 'deleteMissing': True})
+            apps = self._sync(
+                'application',
+                dict((a['name'], a) for a in self._own('application', hostid)),
+                dict((a['name'], dict(a, hostid=hostid)) for a in template.get('applications', [])),
+                rules.get('applications', {}))
+            self._import_items('item', hostid, template.get('items', []),
+                               rules.get('items', {}), apps)
+            rule = rules.get('discoveryRules', {})
+            ruleids = self._import_items('discoveryrule', hostid,
+                                         template.get('discovery_rules', []), rule, apps)
+            triggers, graphs = [], []
+            for discovery in template.get('discovery_rules', []):
+                ruleid = ruleids.get(discovery['key'])
+                if not ruleid:
+                    continue
+                self._import_items('itemprototype', hostid, discovery.get('item_prototypes', []),
+                                   rule, apps, ruleid)
+                triggers.extend(discovery.get('trigger_prototypes', []))
+                graphs.extend(discovery.get('graph_prototypes', []))
+            self._import_triggers('triggerprototype', [hostid], triggers, rule)
+            self._import_graphs('graphprototype', [hostid], graphs, rule)
+
+        self._import_triggers('trigger', hostids, data.get('triggers', []), rules.get('triggers', {}))
+        self._import_graphs('graph', hostids, data.get('graphs', []), rules.get('graphs', {}))
+        return True
+
+    def call(self, method, params):
+        """
+        Execute zabbix API method and return result.
+        """
+
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            type_, action = method.split('.', 1)
+            if method == 'apiinfo.version':
+                return '3.0.0'
+            if type_ == 'user' and action == 'login':
+                token = 'session-{0}'.format(len(self.sessions) + 1)
+                self.sessions.add(token)
+                return token
+            if type_ == 'user' and action == 'checkAuthentication':
+                if params.get('sessionid') not in self.sessions:
+                    raise ZabbixFakeError('Session terminated, re-login, please.')
+                return {'sessionid': params['sessionid']}
+            if type_ == 'user' and action == 'logout':
+                return True
+            if method == 'configuration.import':
+                return self._import(params)
+            if type_ not in self.objects:
+                raise ZabbixFakeError('Incorrect method "{0}".'.format(method))
+            id_field = self.objects[type_][0]
+            objs = params if isinstance(params, list) else [params]
+            if action == 'get':
+                return [self._output(type_, o, params)
+                        for o in sorted(self.tables[type_].values(), key=lambda x: int(x[id_field]))
+                        if self._match(type_, o, params)]
+            if action == 'create':
+                return {id_field + 's': [self._create(type_, o) for o in objs]}
+            if action == 'update':
+                result = []
+                for obj in objs:
+                    current = self.tables[type_].get(str(obj.get(id_field)))
+                    if current is None:
+                        raise ZabbixFakeError('No permissions to referred object or it does not exist!')
+                    current.update(copy.deepcopy(obj))
+                    current[id_field] = str(current[id_field])
+                    result.append(current[id_field])
+                return {id_field + 's': result}
+            if action == 'delete':
+                self._delete(type_, objs)
+                return {id_field + 's': [str(i) for i in objs]}
+            raise ZabbixFakeError('Incorrect method "{0}".'.format(method))
+
+    def do_request(self, method, params=None):
+        """
+        Execute method in format of ZabbixAPI.do_request.
+        """
+
+        params = json.loads(json.dumps(params or {}))
+        return {'jsonrpc': '2.0', 'result': self.call(method, params), 'id': '1'}
+
+    def handle(self, body):
+        """
+        Execute JSON-RPC request and return response.
+        """
+
+        request = json.loads(body)
+        try:
+            if (request['method'] not in ('apiinfo.version', 'user.login', 'user.checkAuthentication') and
+                    request.get('auth') not in self.sessions):
+                raise ZabbixFakeError('Not authorised.', 'Session terminated, re-login, please.')
+            response = self.do_request(request['method'], request.get('params'))
+        except ZabbixFakeError as e:
+            response = {'jsonrpc': '2.0', 'error': e.error, 'id': request.get('id')}
+        return json.dumps(response)
+
+
+class ZabbixFakeHandler(BaseHTTPRequestHandler):
+
+    """
+    HTTP handler of JSON-RPC requests. Connections are kept alive, like
+    real zabbix frontend does.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    # Send response with single write, small writes are delayed by TCP
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.store.lock:
+            self.server.store.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        data = self.server.store.handle(body.decode('utf-8')).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json-rpc')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+class ZabbixFakeServer(ThreadingMixIn, HTTPServer):
+
+    """
+    Local stand-in for zabbix server, to measure zabbixcli without real
+    zabbix. Server listens at random port by default.
+
+    Arguments:
+    store       (ZabbixFakeStore) Storage of zabbix objects.
+    address     (tuple)           Address and port to listen at.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, store, address=('127.0.0.1', 0)):
+        HTTPServer.__init__(self, address, ZabbixFakeHandler)
+        self.store = store
+
+    @property
+    def url(self):
+        """
+        Return URL to pass to zabbixcli as zabbix server.
+        """
+
+        return 'http://{0}:{1}'.format(*self.server_address)
+
+    def start(self):
+        """
+        Serve requests in background thread.
+        """
+
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake zabbix server')
+    parser.add_argument(
+        '-p',
+        '--port',
+        action='store',
+        type=int,
+        default=8080,
+        help='Port to listen at. Default: 8080')
+    parser.add_argument(
+        '-l',
+        '--latency',
+        action='store',
+        type=float,
+        default=0,
+        help='Seconds to wait on every API call. Default: 0')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    server = ZabbixFakeServer(
+        ZabbixFakeStore(args.latency),
+        ('127.0.0.1', args.port))
+    log.info('Fake zabbix server: %s', server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
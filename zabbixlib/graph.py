@@ -4,6 +4,21 @@ from object import ZabbixObject
 log = logging.getLogger(__name__)
 
 
+def graph_item_names(graph):
+    """
+    Return names of all items used by graph.
+
+    Arguments:
+    graph       (dict)            Dictionary discribed zabbix graph template.
+    """
+
+    result = [gitem['item'] for gitem in graph.get('items', [])]
+    for type_, value in (('y_min_type', 'y_min'), ('y_max_type', 'y_max')):
+        if str(graph.get(type_)).lower() == 'item':
+            result.append(graph.get(value))
+    return result
+
+
 class ZabbixGraph(ZabbixObject):
 
     """
@@ -14,14 +29,16 @@ class ZabbixGraph(ZabbixObject):
     obj         (dict)            Dictionary discribed zabbix graph template.
     defaults    (ZabbixDefaults)  Default values.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, defaults, template_id):
+    def __init__(self, zapi, obj, defaults, template_id, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.defaults = defaults
         self.template_id = template_id
         self.obj_type = 'graph'
+        self.snapshot = snapshot
         self.zbx_item_class = 'item'
         ZabbixObject(self.zapi, self.obj, self.template_id)
 
@@ -30,10 +47,7 @@ class ZabbixGraph(ZabbixObject):
         if type_ == self.defaults['y_min_max_type'].index('fixed'):
             result = float(value)
         elif type_ == self.defaults['y_min_max_type'].index('item'):
-            result = self.zapi.get_id(
-                self.zbx_item_class,
-                value,
-                hostid=self.template_id)
+            result = self.item_ids.get(value)
         logging.debug(
             '_get_y_valye({0},{1}): {2}'.format(
                 type_,
@@ -41,6 +55,28 @@ class ZabbixGraph(ZabbixObject):
                 result))
         return result
 
+    def _resolve_items(self):
+        """
+        Find ids of all items used by graph with single request.
+
+        Return  (dict)  Item ids indexed by name.
+        """
+
+        names = graph_item_names(self.obj)
+        if self.snapshot:
+            return self.snapshot.resolve(self.zbx_item_class, names)
+
+        result = {}
+        if names:
+            response = self.zapi.do_request(
+                '{0}.get'.format(self.zbx_item_class),
+                {'output': ['itemid', 'name'],
+                 'filter': {'name': names},
+                 'hostids': self.template_id})['result']
+            for item in response:
+                result.setdefault(item['name'], int(item['itemid']))
+        return result
+
     def _create_graph_items_req(self, req):
         """
         Create request for graph items changes.
@@ -52,10 +88,7 @@ class ZabbixGraph(ZabbixObject):
         req['gitems'] = []
 
         for gitem in gitems:
-            item_id = self.zapi.get_id(
-                self.zbx_item_class,
-                gitem['item'],
-                hostid=self.template_id)
+            item_id = self.item_ids.get(gitem['item'])
 
             item = {
                 'itemid': item_id,
@@ -100,6 +133,8 @@ class ZabbixGraph(ZabbixObject):
         Return  (str)   Request for changes.
         """
 
+        self.item_ids = self._resolve_items()
+
         result = {
             'name': self.obj['name'],
             'width': int(
@@ -230,36 +265,6 @@ class ZabbixGraph(ZabbixObject):
         self._pie_graph_req(req)
         log.debug('Exploded graph:')
 
-    def apply(self):
-        """
-        Push graph object to zabbix server.
-        """
-
-        result = None
-        req = self._create_request()
-
-        log.info("%s: '%s'", str(self.obj_type).capitalize(), self.obj['name'])
-
-        # Get 'graph' or 'graphprototype' object id
-        obj_id = self.zapi.get_id(
-            self.obj_type,
-            self.obj['name'],
-            hostid=self.template_id)
-
-        if obj_id:
-            req.update({'graphid': obj_id})
-            zbx_method = 'update'
-        else:
-            zbx_method = 'create'
-
-        func = "self.zapi.{obj_type}.{zbx_method}".format(
-            obj_type=self.obj_type,
-            zbx_method=zbx_method)
-        log.debug('%s: %s', func, req)
-        result = eval(func)(req)
-
-        return result
-
 
 class ZabbixGraphPrototype(ZabbixGraph):
 
@@ -271,13 +276,15 @@ class ZabbixGraphPrototype(ZabbixGraph):
     obj         (dict)            Dictionary discribed zabbix graph prototype template.
     defaults    (ZabbixDefaults)  Default values.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, defaults, template_id):
+    def __init__(self, zapi, obj, defaults, template_id, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.defaults = defaults
         self.template_id = template_id
+        self.snapshot = snapshot
         ZabbixGraph(self.zapi, self.obj, self.defaults, self.template_id)
 
     def _create_request(self):
@@ -1,4 +1,5 @@
 import logging
+import threading
 
 log = logging.getLogger(__name__)
 
@@ -47,20 +48,82 @@ class ZabbixGroups(object):
     Arguments:
     zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
     groups      (list of str)     List of group names.
+    registry    (ZabbixGroupRegistry)  Groups shared by all templates.
     """
 
-    def __init__(self, zapi, groups):
+    def __init__(self, zapi, groups, registry=None):
         self.zapi = zapi
         self.groups = groups
+        self.registry = registry
 
     def apply(self):
         """
         Push hostgroups\groups object to zabbix server.
         """
 
+        if self.registry:
+            return self.registry.apply(self.groups)
+
         result = []
         for group in self.groups:
             groupid = ZabbixGroup(self.zapi, group, with_id=True).apply()
             if groupid:
                 result.append(groupid)
         return result
+
+
+class ZabbixGroupRegistry(object):
+
+    """
+    Resolve host groups of all templates of the run at once.
+
+    Names of all groups used by templates are registered first. On first
+    use they are looked up with single 'hostgroup.get' request, and missing
+    ones are created with single array 'hostgroup.create' request. Ids are
+    kept for the rest of the run.
+
+    Arguments:
+    zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
+    names       (list of str)     Group names used by templates.
+    """
+
+    def __init__(self, zapi, names=()):
+        self.zapi = zapi
+        # Names which are not resolved yet
+        self.pending = set(names)
+        # Group name: group id
+        self.ids = {}
+        self.lock = threading.Lock()
+
+    def _resolve(self):
+        """
+        Find ids of pending groups and create missing ones.
+        """
+
+        names = sorted(self.pending)
+        self.pending.clear()
+
+        for group in self.zapi.do_request('hostgroup.get', {
+                'output': ['groupid', 'name'],
+                'filter': {'name': names}})['result']:
+            self.ids[group['name']] = int(group['groupid'])
+
+        missing = [name for name in names if name not in self.ids]
+        if missing:
+            for name in missing:
+                log.info("Hostgroup: '%s'", name)
+            result = self.zapi.hostgroup.create(*[{'name': name} for name in missing])
+            for name, groupid in zip(missing, result['groupids']):
+                self.ids[name] = int(groupid)
+
+    def apply(self, names):
+        """
+        Return  (list)  Ids of groups in zabbix format. Groups are created
+                        if they don't exist.
+        """
+
+        with self.lock:
+            self.pending.update(name for name in names if name not in self.ids)
+            if self.pending:
+                self._resolve()
+            return [{'groupid': self.ids[name]} for name in names]
@@ -0,0 +1,256 @@
+import json
+import logging
+import time
+from discovery import ZabbixDiscovery
+from graph import ZabbixGraph, ZabbixGraphPrototype
+from item import ZabbixItem, ZabbixItemPrototype
+from trigger import ZabbixTrigger, ZabbixTriggerPrototype
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixImportError(Exception):
+
+    """
+    Template can't be pushed with 'configuration.import'.
+    """
+
+
+class ZabbixImportNames(object):
+
+    """
+    Stand-in for template snapshot, which resolves items to their names, so
+    rendered graphs refer to items by name instead of id.
+    """
+
+    def resolve(self, obj_type, names):
+        return dict((name, name) for name in names)
+
+
+class ZabbixTemplateImport(object):
+
+    """
+    Push whole template to zabbix with single 'configuration.import' request.
+
+    Template is rendered into zabbix 3.0 import format: applications, items,
+    discovery rules with prototypes, graphs, triggers, macros and linked
+    templates. Requests are built by the same objects as for per-object
+    sync, and converted to import format. Objects missing in template are
+    deleted by zabbix. Alerts and auto-registration are actions, they aren't
+    part of import format and should be applied separately.
+
+    Arguments:
+    zapi        (ZabbixAPI)           ZabbixAPI connector to send request.
+    template    (ZabbixTemplateFile)  Loaded template.
+    defaults    (ZabbixDefaults)      Default values.
+    """
+
+    version = '3.0'
+
+    rules = {
+        'groups': {'createMissing': True},
+        'templates': {'createMissing': True, 'updateExisting': True},
+        'templateLinkage': {'createMissing': True},
+        'applications': {'createMissing': True, 'deleteMissing': True},
+        'items': {'createMissing': True, 'updateExisting': True, 'deleteMissing': True},
+        'discoveryRules': {'createMissing': True, 'updateExisting': True, 'deleteMissing': True},
+        'triggers': {'createMissing': True, 'updateExisting': True, 'deleteMissing': True},
+        'graphs': {'createMissing': True, 'updateExisting': True, 'deleteMissing': True},
+    }
+
+    # Fields of import format which are not set by zabbixcli. All values
+    # are strings, like in exported templates.
+    item_fields = {
+        'snmp_community': '', 'snmp_oid': '', 'multiplier': '0', 'formula': '1',
+        'allowed_hosts': '', 'units': '', 'snmpv3_contextname': '',
+        'snmpv3_securityname': '', 'snmpv3_securitylevel': '0',
+        'snmpv3_authprotocol': '0', 'snmpv3_authpassphrase': '',
+        'snmpv3_privprotocol': '0', 'snmpv3_privpassphrase': '',
+        'delay_flex': '', 'params': '', 'ipmi_sensor': '', 'data_type': '0',
+        'authtype': '0', 'username': '', 'password': '', 'publickey': '',
+        'privatekey': '', 'port': '', 'description': '', 'inventory_link': '0',
+        'valuemap': [], 'logtimefmt': '', 'delta': '0',
+    }
+    discovery_fields = {
+        'snmp_community': '', 'snmp_oid': '', 'allowed_hosts': '',
+        'snmpv3_contextname': '', 'snmpv3_securityname': '',
+        'snmpv3_securitylevel': '0', 'snmpv3_authprotocol': '0',
+        'snmpv3_authpassphrase': '', 'snmpv3_privprotocol': '0',
+        'snmpv3_privpassphrase': '', 'delay_flex': '', 'params': '',
+        'ipmi_sensor': '', 'authtype': '0', 'username': '', 'password': '',
+        'publickey': '', 'privatekey': '', 'port': '', 'description': '',
+        'host_prototypes': [],
+    }
+    trigger_fields = {'description': '', 'dependencies': []}
+    graph_fields = {
+        'yaxismin': '0', 'yaxismax': '100', 'show_work_period': '1',
+        'show_triggers': '1', 'show_legend': '1', 'show_3d': '0',
+        'percent_left': '0', 'percent_right': '0', 'ymin_type_1': '0',
+        'ymax_type_1': '0', 'ymin_item_1': '0', 'ymax_item_1': '0',
+    }
+    graph_item_fields = {'drawtype': '0', 'yaxisside': '0', 'calc_fnc': '2', 'type': '0'}
+
+    def __init__(self, zapi, template, defaults):
+        self.zapi = zapi
+        self.template = template
+        self.defaults = defaults
+        self.name = template['name']
+        self.names = ZabbixImportNames()
+        # Item keys by (item type, item name), for graph items
+        self.keys = {}
+
+    def _fields(self, defaults, req, renames=None):
+        """
+        Convert request of zabbix API to object of import format.
+        """
+
+        result = dict(defaults)
+        for field, value in req.items():
+            field = (renames or {}).get(field, field)
+            if field is not None:
+                result[field] = self._string(value)
+        return result
+
+    def _item(self, obj, app, item_type='item'):
+        cls = ZabbixItemPrototype if item_type == 'itemprototype' else ZabbixItem
+        req = cls(self.zapi, obj, self.defaults, None)._create_request()
+        self.keys[(item_type, obj['name'])] = req['key_']
+        result = self._fields(
+            self.item_fields,
+            req,
+            {'key_': 'key', 'hostid': None, 'ruleid': None, 'applications': None})
+        result['applications'] = [{'name': app}]
+        if item_type == 'itemprototype':
+            result['application_prototypes'] = []
+        return result
+
+    def _trigger(self, obj, cls=ZabbixTrigger):
+        req = cls(self.zapi, obj, self.defaults, None)._create_request()
+        return self._fields(self.trigger_fields, req, {'description': 'name'})
+
+    def _graph_item(self, item_type, name):
+        key = self.keys.get((item_type, name))
+        if key is None:
+            # Item of linked template, its key is unknown
+            raise ZabbixImportError('Unknown {0}: {1}'.format(item_type, name))
+        return {'host': self.name, 'key': key}
+
+    def _graph(self, obj, cls=ZabbixGraph, item_type='item'):
+        req = cls(self.zapi, obj, self.defaults, None, self.names)._create_request()
+        result = self._fields(
+            self.graph_fields,
+            req,
+            {'graphtype': 'type',
+             'ymin_type': 'ymin_type_1',
+             'ymax_type': 'ymax_type_1',
+             'ymin_itemid': None,
+             'ymax_itemid': None,
+             'gitems': None})
+        for field in ('ymin_itemid', 'ymax_itemid'):
+            if req.get(field):
+                result[field.replace('itemid', 'item_1')] = self._graph_item(item_type, req[field])
+
+        result['graph_items'] = []
+        for gitem in req['gitems']:
+            graph_item = self._fields(
+                self.graph_item_fields,
+                gitem,
+                {'sorted': 'sortorder', 'itemid': None})
+            graph_item['item'] = self._graph_item(item_type, gitem['itemid'])
+            result['graph_items'].append(graph_item)
+        return result
+
+    def _discovery(self, obj, app):
+        req = ZabbixDiscovery(self.zapi, obj, self.defaults, None)._create_request()
+        result = self._fields(
+            self.discovery_fields,
+            req,
+            {'key_': 'key', 'hostid': None, 'filter': None})
+
+        conditions = []
+        filter_ = obj.get('filter', {})
+        if filter_.get('macro'):
+            conditions.append({
+                'macro': filter_['macro'],
+                'value': filter_.get('regexp', ''),
+                # Matches regular expression
+                'operator': '8',
+                'formulaid': 'A'})
+        result['filter'] = {'evaltype': '0', 'formula': '', 'conditions': conditions}
+
+        result['item_prototypes'] = [
+            self._item(item, app, 'itemprototype') for item in obj.get('items', [])]
+        result['trigger_prototypes'] = [
+            self._trigger(trigger, ZabbixTriggerPrototype)
+            for trigger in obj.get('triggers', [])]
+        result['graph_prototypes'] = [
+            self._graph(graph, ZabbixGraphPrototype, 'itemprototype')
+            for graph in obj.get('graphs', [])]
+        return result
+
+    def _string(self, value):
+        """
+        Convert value of request to string, like in exported templates.
+        """
+
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return str(int(value))
+        if isinstance(value, (int, float)):
+            return str(value)
+        return value
+
+    def render(self):
+        """
+        Render template into zabbix import format.
+
+        Return  (dict)  Template export.
+        """
+
+        apps = self.template.get('applications', {})
+        discoveries = self.template.get('discovery', {})
+
+        items = []
+        for app, app_items in apps.iteritems():
+            if str(app_items).lower() == 'disabled':
+                # Items of disabled application are only known by zabbix
+                raise ZabbixImportError('Application is disabled: {0}'.format(app))
+            items.extend(self._item(item, app) for item in app_items)
+
+        template = {
+            'template': self.name,
+            'name': self.name,
+            'description': '',
+            'groups': [{'name': group} for group in self.template['groups']],
+            'templates': [{'name': name} for name in self.template.get('templates', [])],
+            'applications': [{'name': app} for app in sorted(set(apps) | set(discoveries))],
+            'items': items,
+            'discovery_rules': [
+                self._discovery(discovery, app)
+                for app, discovery in discoveries.iteritems()],
+            'macros': [
+                {'macro': macro['macro'], 'value': self._string(macro['value'])}
+                for macro in self.template.get('macros', [])],
+            'screens': [],
+        }
+
+        return {'zabbix_export': {
+            'version': self.version,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'groups': [{'name': group} for group in self.template['groups']],
+            'templates': [template],
+            'triggers': [self._trigger(trigger) for trigger in self.template.get('triggers', [])],
+            'graphs': [self._graph(graph) for graph in self.template.get('graphs', [])],
+        }}
+
+    def apply(self):
+        """
+        Push template to zabbix server.
+        """
+
+        source = json.dumps(self.render())
+        log.info("Import: '%s', %s bytes", self.name, len(source))
+        return self.zapi.do_request(
+            'configuration.import',
+            {'format': 'json', 'rules': self.rules, 'source': source})
@@ -14,14 +14,16 @@ class ZabbixItem(ZabbixObject):
     obj         (dict)            Dictionary discribed zabbix item template.
     defaults    (ZabbixDefaults)  Default values.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj=None, defaults=None, template_id=None):
+    def __init__(self, zapi, obj=None, defaults=None, template_id=None, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.defaults = defaults
         self.template_id = template_id
         self.obj_type = 'item'
+        self.snapshot = snapshot
         ZabbixObject(self.zapi, self.obj, self.template_id)
 
     def _create_request(self):
@@ -89,17 +91,6 @@ class ZabbixItem(ZabbixObject):
             })
         return result
 
-    def disable(self, id_):
-        """
-        Disable specifiec zabbix item.
-
-        Arguments:
-        id_   (int)     Zabbix item ID.
-        """
-
-        return self.zapi.item.update({'itemid': id_, 'status': 1})
-
-
 class ZabbixItemPrototype(ZabbixItem):
 
     """
@@ -110,13 +101,15 @@ class ZabbixItemPrototype(ZabbixItem):
     obj         (dict)            Dictionary discribed zabbix item template.
     defaults    (ZabbixDefaults)  Default values.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, defaults, template_id):
+    def __init__(self, zapi, obj, defaults, template_id, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.defaults = defaults
         self.template_id = template_id
+        self.snapshot = snapshot
         ZabbixItem(self.zapi, self.obj, self.defaults, self.template_id)
 
     def _create_request(self):
@@ -131,3 +124,110 @@ class ZabbixItemPrototype(ZabbixItem):
         result.update({'ruleid': self.obj.get('rule_id')})
         self.obj_type = 'itemprototype'
         return result
+
+    def _changes(self, name, req):
+        """
+        Compare request with current state of item prototype. Discovery
+        rule of existing prototype can't be changed, and zabbix doesn't
+        return it, so it's not compared.
+        """
+
+        req = dict((k, v) for k, v in req.iteritems() if k != 'ruleid')
+        return super(ZabbixItemPrototype, self)._changes(name, req)
+
+
+class ZabbixItemStatus(object):
+
+    """
+    Enable or disable many items at once.
+
+    Items are selected by template, application and/or key pattern, and
+    only items which are not in requested state yet are changed, with
+    array 'item.update' requests.
+
+    Arguments:
+    zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
+    chunk_size  (int)             Max number of items in one request.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
+    """
+
+    # Item status: zabbix value
+    statuses = {'enabled': 0, 'disabled': 1}
+
+    def __init__(self, zapi, chunk_size=100, snapshot=None):
+        self.zapi = zapi
+        self.chunk_size = chunk_size
+        self.snapshot = snapshot
+
+    def find(self, template_id=None, app=None, key=None):
+        """
+        Return items which match all specified conditions.
+
+        Arguments:
+        template_id (int)             Zabbix Template id.
+        app         (str)             Application name.
+        key         (str)             Item key, '*' matches any string.
+        """
+
+        # Template snapshot already has all items with their applications
+        if self.snapshot and not key and template_id in (None, self.snapshot.template_id):
+            items = self.snapshot.objects('item').values()
+            if app:
+                app_id = str(self.snapshot.get_id('application', app))
+                items = [
+                    item for item in items
+                    if app_id in [x['applicationid'] for x in item.get('applications', [])]]
+            return list(items)
+
+        req = {'output': ['itemid', 'key_', 'status']}
+        if template_id:
+            req['hostids'] = template_id
+        if app:
+            req['application'] = app
+        if key:
+            req['search'] = {'key_': key}
+            req['searchWildcardsEnabled'] = True
+        return self.zapi.do_request('item.get', req)['result']
+
+    def apply(self, status, **selector):
+        """
+        Set status of selected items.
+
+        Arguments:
+        status      (str)             'enabled' or 'disabled'.
+        selector    (dict)            Conditions of find().
+
+        Return  (int)   Number of changed items.
+        """
+
+        value = self.statuses[status]
+        changed = []
+        for item in self.find(**selector):
+            # Items created in this run have no status in snapshot
+            if str(item.get('status')) == str(value):
+                action = 'unchanged'
+            else:
+                action = 'updated'
+                changed.append(item)
+            if self.snapshot:
+                self.snapshot.count('item', action)
+
+        ids = [item['itemid'] for item in changed]
+
+        for i in range(0, len(ids), self.chunk_size):
+            reqs = [{'itemid': id_, 'status': value}
+                    for id_ in ids[i:i + self.chunk_size]]
+            log.debug('item.update: %s', reqs)
+            self.zapi.item.update(*reqs)
+        for item in changed:
+            item['status'] = str(value)
+
+        if ids:
+            log.info('Item status: %s items %s', len(ids), status)
+        return len(ids)
+
+    def enable(self, **selector):
+        return self.apply('enabled', **selector)
+
+    def disable(self, **selector):
+        return self.apply('disabled', **selector)
@@ -0,0 +1,199 @@
+import fcntl
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixJobQueue(object):
+
+    """
+    Persistent queue of templates waiting to be applied, shared between
+    processes.
+
+    Same template is queued only once, so requests for template which is
+    being applied now are merged into single follow-up run. Only one process
+    applies templates at the same time, others just put templates in queue.
+
+    Taken templates stay in queue until they are applied, so templates of
+    worker which was killed while applying them are taken again by next one.
+
+    Arguments:
+    path        (str)             Path to queue file.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.runner = None
+
+    def lock(self, suffix, flags=fcntl.LOCK_EX):
+        """
+        Lock file next to queue file, wait for lock by default.
+
+        Return  (file)  Locked file, or None if it's locked by other process.
+        """
+
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname, 0o700)
+        f = open('{0}.{1}'.format(self.path, suffix), 'a')
+        try:
+            fcntl.flock(f, flags)
+        except IOError:
+            f.close()
+            return None
+        return f
+
+    def _read(self):
+        """
+        Return  (dict)  Time templates were queued at, by name, for 'queued'
+                        and 'taken' templates, and 'sha' of last commit
+                        which changes were queued.
+        """
+
+        try:
+            with open(self.path) as f:
+                jobs = json.load(f)
+        except (IOError, OSError, ValueError):
+            jobs = {}
+        jobs.setdefault('queued', {})
+        jobs.setdefault('taken', {})
+        return jobs
+
+    def _save(self, jobs):
+        """
+        Atomically write queue file.
+        """
+
+        tmp = '{0}.{1}'.format(self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(jobs, f)
+        os.rename(tmp, self.path)
+
+    def _update(self, func):
+        """
+        Change queue under lock.
+        """
+
+        lock = self.lock('lock')
+        try:
+            jobs = self._read()
+            result = func(jobs)
+            self._save(jobs)
+            return result
+        finally:
+            lock.close()
+
+    def put(self, names, queued=None, sha=None):
+        """
+        Add templates to queue. Templates which are in queue already keep
+        their original time.
+
+        Arguments:
+        names   (list of str)   Template names.
+        queued  (dict)          Time templates were queued at, by name.
+        sha     (str)           Commit which changes are queued.
+        """
+
+        def put(jobs):
+            now = time.time()
+            for name in names:
+                jobs['queued'].setdefault(name, (queued or {}).get(name, now))
+            if sha:
+                jobs['sha'] = sha
+            return len(jobs['queued']) + len(jobs['taken'])
+
+        depth = self._update(put)
+        log.info('Queue: %s templates are waiting', depth)
+
+    def take(self):
+        """
+        Take all templates from queue. Templates are kept in queue as taken,
+        until they are done.
+
+        Return  (dict)  Time templates were queued at, by name.
+        """
+
+        def take(jobs):
+            # Templates left by killed worker are taken again
+            taken = jobs['taken']
+            for name, queued in jobs['queued'].iteritems():
+                taken[name] = min(queued, taken.get(name, queued))
+            jobs['queued'] = {}
+            return dict(taken)
+
+        result = self._update(take)
+        if result:
+            now = time.time()
+            log.info(
+                'Queue: took %s templates, longest wait %.1fs',
+                len(result),
+                now - min(result.values()))
+        return result
+
+    def done(self, name):
+        """
+        Remove taken template, which was successfully applied, from queue.
+        """
+
+        def done(jobs):
+            jobs['taken'].pop(name, None)
+
+        self._update(done)
+
+    def retry(self, names):
+        """
+        Return taken templates, which were failed, back to queue.
+        """
+
+        def retry(jobs):
+            for name in names:
+                if name in jobs['taken']:
+                    queued = jobs['taken'].pop(name)
+                    jobs['queued'][name] = min(
+                        queued,
+                        jobs['queued'].get(name, queued))
+
+        self._update(retry)
+
+    def pending(self):
+        """
+        Return number of templates in queue.
+        """
+
+        jobs = self._read()
+        return len(jobs['queued']) + len(jobs['taken'])
+
+    def sha(self):
+        """
+        Return  (str)   Last commit which changes were queued.
+        """
+
+        return self._read().get('sha')
+
+    def finished(self):
+        """
+        Return  (str)   Last commit which changes were queued, if all of
+                        them are applied, otherwise None.
+        """
+
+        jobs = self._read()
+        if not jobs['queued'] and not jobs['taken']:
+            return jobs.get('sha')
+
+    def acquire(self):
+        """
+        Try to become the only process which applies templates.
+
+        Return  (bool)  True if lock was acquired.
+        """
+
+        self.runner = self.lock('run', fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return self.runner is not None
+
+    def release(self):
+        if self.runner:
+            self.runner.close()
+            self.runner = None
@@ -1,63 +1,88 @@
 import logging
-from object import ZabbixObject
 
 log = logging.getLogger(__name__)
 
+# Macro to keep fingerprint of applied template, it's managed by zabbixcli
+FINGERPRINT_MACRO = '{$ZABBIXCLI_FINGERPRINT}'
 
-class ZabbixMacro(ZabbixObject):
+
+class ZabbixMacros(object):
 
     """
-    Implements working with zabbix usermacro objects.
+    Sync all usermacros of template at once.
+
+    Current macros are taken from template snapshot, which fetches them
+    with single request. New macros are created, changed ones are updated
+    and macros missing in template are deleted, each with one array
+    request. Unchanged macros aren't sent. Fingerprint macro is managed
+    separately and is never deleted.
 
     Arguments:
     zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
-    obj         (dict)            Dictionary discribed zabbix usermacro template.
-    defaults    (ZabbixDefaults)  Default values.
+    macros      (list of dict)    Macros described in template.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, template_id):
+    def __init__(self, zapi, macros, template_id, snapshot):
         self.zapi = zapi
-        self.obj = obj
+        self.macros = macros
         self.template_id = template_id
-        self.obj_type = 'usermacro'
-        ZabbixObject(self.zapi, self.obj, self.template_id)
+        self.snapshot = snapshot
 
-    def _create_request(self):
+    def changes(self):
         """
-        Create request for usermacro changes.
+        Compare macros of template with current ones.
 
-        Return  (str)   Request for changes.
+        Return  (tuple)   Requests to create, requests to update and ids
+                          to delete.
         """
 
-        result = None
-        result = {
-            'macro': self.obj['macro'],
-            'value': self.obj['value'],
-            'hostid': self.template_id,
-        }
-        return result
+        current = self.snapshot.objects('usermacro')
+        create = []
+        update = []
+        for macro in self.macros:
+            obj = current.get(macro['macro'])
+            if obj is None:
+                create.append({
+                    'macro': macro['macro'],
+                    'value': macro['value'],
+                    'hostid': self.template_id})
+            elif u'{0}'.format(macro['value']) != obj['value']:
+                # Values are opaque strings, '1m' and '60' are different
+                update.append({
+                    'hostmacroid': obj['hostmacroid'],
+                    'value': macro['value']})
+                self.snapshot.count('usermacro', 'updated')
+            else:
+                self.snapshot.count('usermacro', 'unchanged')
+
+        names = set(macro['macro'] for macro in self.macros)
+        names.add(FINGERPRINT_MACRO)
+        delete = sorted(
+            (name, obj['hostmacroid']) for name, obj in current.items()
+            if name not in names)
+        return create, update, delete
 
     def apply(self):
         """
-        Push usermacro object to zabbix server.
+        Push changed macros to zabbix server.
         """
-        result = None
-        req = self._create_request()
-
-        log.info("%s: '%s'", str(self.obj_type).capitalize(), req['macro'])
-
-        # Get 'macro' object id
-        log.debug('ZabbixMacro._create_request: %s', req)
-        obj_id = self.zapi.get_id(
-            'usermacro',
-            req['macro'],
-            hostid=self.template_id)
-
-        if obj_id:
-            result = self.zapi.usermacro.update(
-                hostmacroid=obj_id,
-                value=req['value'])
-        else:
-            result = self.zapi.usermacro.create(req)
-        return result
+
+        create, update, delete = self.changes()
+
+        if delete:
+            log.info('Usermacro delete: %s', [name for name, id_ in delete])
+            self.zapi.usermacro.delete(*[id_ for name, id_ in delete])
+            for name, id_ in delete:
+                self.snapshot.remove('usermacro', name)
+
+        if update:
+            log.info('Usermacro update: %s', len(update))
+            self.zapi.usermacro.update(*update)
+
+        if create:
+            log.info('Usermacro create: %s', [req['macro'] for req in create])
+            result = self.zapi.usermacro.create(*create)
+            for req, id_ in zip(create, result['hostmacroids']):
+                self.snapshot.add('usermacro', req['macro'], id_)
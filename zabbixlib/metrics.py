@@ -0,0 +1,161 @@
+import collections
+import json
+import logging
+import os
+import time
+from template import ZabbixTemplateCache
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixMetrics(object):
+
+    """
+    Export metrics of sync run for monitoring, in Prometheus textfile
+    collector format and/or as JSON lines.
+
+    Textfile is replaced with new one on each run, JSON line is appended to
+    file on each run. Both are written atomically, so collector never reads
+    partially written metrics.
+
+    Arguments:
+    textfile    (str)             Path to Prometheus textfile (*.prom).
+    jsonl       (str)             Path to JSON lines file.
+    """
+
+    prefix = 'zabbixcli'
+
+    def __init__(self, textfile=None, jsonl=None):
+        self.textfile = textfile
+        self.jsonl = jsonl
+        # Metric name: (type, help, list of (labels, value))
+        self.metrics = collections.OrderedDict()
+
+    def add(self, name, help_, value, labels=None, type_='gauge'):
+        """
+        Add single sample of metric.
+        """
+
+        metric = self.metrics.setdefault(
+            '{0}_{1}'.format(self.prefix, name),
+            (type_, help_, []))
+        metric[2].append((labels or {}, value))
+
+    def collect(self, duration, changes, errors, timer, profiler=None, lookup=None):
+        """
+        Collect metrics of sync run.
+
+        Arguments:
+        duration    (float)           Seconds the whole run took.
+        changes     (dict)            Counters of objects by (type, action),
+                                      by template name.
+        errors      (dict)            Errors by names of failed templates.
+        timer       (ZabbixTimer)     Time of sync phases.
+        profiler    (ZabbixProfiler)  Recorded API calls.
+        lookup      (ZabbixAPICache)  Cache of API requests.
+        """
+
+        self.add('last_run_timestamp_seconds', 'Time sync run finished at', time.time())
+        self.add('run_duration_seconds', 'Duration of sync run', duration)
+
+        phases = timer.by_phase()
+        self.add('yaml_load_seconds', 'Time to load templates', phases.get('load', 0))
+        for phase, elapsed in phases.items():
+            self.add('phase_duration_seconds', 'Time of sync phase of all templates',
+                     elapsed, {'phase': phase})
+
+        templates = timer.by_template()
+        for name in sorted(set(templates) | set(errors)):
+            self.add('template_duration_seconds', 'Duration of template sync',
+                     templates.get(name, 0), {'template': name})
+            self.add('template_failed', 'Template sync failed',
+                     int(name in errors), {'template': name})
+        self.add('failures', 'Number of failed templates', len(errors))
+
+        for name, counter in sorted(changes.items()):
+            for (obj_type, action), number in sorted(counter.items()):
+                self.add('objects', 'Number of template objects by action', number,
+                         {'template': name, 'type': obj_type, 'action': action})
+
+        if profiler:
+            for method, stats in sorted(profiler.by_method().items()):
+                self.add('api_calls', 'Number of API calls',
+                         len(stats['latency']), {'method': method})
+                self.add('api_call_seconds', 'Time of API calls',
+                         sum(stats['latency']), {'method': method})
+                self.add('api_call_errors', 'Number of failed API calls',
+                         stats['errors'], {'method': method})
+
+        caches = [('yaml', ZabbixTemplateCache)]
+        if lookup:
+            caches.append(('lookup', lookup))
+        for name, cache in caches:
+            total = cache.hits + cache.misses
+            self.add('cache_hits', 'Cache hits', cache.hits, {'cache': name})
+            self.add('cache_misses', 'Cache misses', cache.misses, {'cache': name})
+            self.add('cache_hit_ratio', 'Cache hit ratio',
+                     float(cache.hits) / total if total else 0, {'cache': name})
+
+    def _labels(self, labels):
+        def escape(value):
+            return u'{0}'.format(value).replace(
+                '\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        # Template names may be unicode
+        if not labels:
+            return u''
+        return u'{{{0}}}'.format(u','.join(
+            u'{0}="{1}"'.format(key, escape(value))
+            for key, value in sorted(labels.items())))
+
+    def prometheus(self):
+        """
+        Return  (str)   Metrics in Prometheus text exposition format.
+        """
+
+        lines = []
+        for name, (type_, help_, samples) in self.metrics.items():
+            lines.append('# HELP {0} {1}'.format(name, help_))
+            lines.append('# TYPE {0} {1}'.format(name, type_))
+            for labels, value in samples:
+                lines.append(u'{0}{1} {2!r}'.format(name, self._labels(labels), float(value)))
+        return u'\n'.join(lines) + u'\n'
+
+    def json(self):
+        """
+        Return  (dict)  Metrics by name. Metric without labels is single
+                        value, other ones are lists of labels with value.
+        """
+
+        result = {}
+        for name, (type_, help_, samples) in self.metrics.items():
+            if len(samples) == 1 and not samples[0][0]:
+                result[name] = samples[0][1]
+            else:
+                result[name] = [dict(labels, value=value) for labels, value in samples]
+        return result
+
+    def write(self):
+        """
+        Write collected metrics to configured files.
+        """
+
+        if self.textfile:
+            path = os.path.expanduser(self.textfile)
+            tmp = '{0}.{1}'.format(path, os.getpid())
+            with open(tmp, 'wb') as f:
+                f.write(self.prometheus().encode('utf-8'))
+            os.rename(tmp, path)
+            log.debug('Metrics were written to %s', path)
+
+        if self.jsonl:
+            path = os.path.expanduser(self.jsonl)
+            line = json.dumps(self.json(), sort_keys=True) + '\n'
+            # Single write to file opened for append doesn't mix with
+            # lines of other processes
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+            log.debug('Metrics were appended to %s', path)
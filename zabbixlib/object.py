@@ -1,4 +1,5 @@
 import logging
+from diff import diff
 
 log = logging.getLogger(__name__)
 
@@ -12,13 +13,15 @@ class ZabbixObject(object):
     zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
     obj         (dict)            Dictionary discribed zabbix template.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, template_id=None, obj_type=None):
+    def __init__(self, zapi, obj, template_id=None, obj_type=None, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.template_id = template_id
         self.obj_type = obj_type
+        self.snapshot = snapshot
 
     def _get_id_name(self):
         """
@@ -28,35 +31,86 @@ class ZabbixObject(object):
         result = None
         id_name = {'discoveryrule': 'item',
                    'hostgroup': 'group',
-                   'graphptototype': 'graph',
+                   'graphprototype': 'graph',
                    'itemprototype': 'item',
                    'triggerprototype': 'trigger',
+                   'usermacro': 'hostmacro',
                    }.get(self.obj_type, self.obj_type)
         result = '{0}id'.format(id_name)
         return result
 
-    def _func(self, req):
+    def _get_id(self, obj_type, name, **args):
         """
-        Generate zapi function name.
+        Return id of zabbix object. Template snapshot is used if it's
+        available, otherwise request is sent to zabbix server.
         """
 
-        result = None
+        if self.snapshot:
+            return self.snapshot.get_id(obj_type, name)
+        return self.zapi.get_id(obj_type, name, **args)
+
+    def _get_name(self):
+        """
+        Return name of zabbix object.
+        """
+
+        return self.obj['name']
+
+    def _remember(self, name, result, index=0):
+        """
+        Save id of just created object into template snapshot.
+
+        Arguments:
+        name    (str)   Object name.
+        result  (dict)  Response of zabbix 'create' method.
+        index   (int)   Position of object in request.
+        """
+
+        if self.snapshot:
+            ids = result['{0}s'.format(self._get_id_name())]
+            self.snapshot.add(self.obj_type, name, ids[index])
+
+    def _changes(self, name, req):
+        """
+        Compare request with current state of object in template snapshot.
+
+        Return  (dict)  Only changed fields of request.
+        """
+
+        result = req
+        current = self.snapshot.get(self.obj_type, name) if self.snapshot else None
+        if current:
+            result = diff(req, current)
+            log.debug('%s changes: %s', self.obj_type, result)
+            self.snapshot.count(self.obj_type, 'updated' if result else 'unchanged')
+        return result
+
+    def _prepare(self):
+        """
+        Create request and choose zabbix method to push it.
+
+        Return  (tuple)   Zabbix method ('create', 'update' or None if
+                          object is up to date) and request.
+        """
+
+        req = self._create_request()
+        obj_id = None
         if self.template_id:
-            obj_id = self.zapi.get_id(
+            obj_id = self._get_id(
                 self.obj_type,
-                self.obj['name'],
+                self._get_name(),
                 hostid=self.template_id)
         if obj_id:
-            req.update({self._get_id_name(): obj_id})
-            zbx_method = 'update'
+            req = self._changes(self._get_name(), req)
+            if req:
+                req.update({self._get_id_name(): obj_id})
+                zbx_method = 'update'
+            else:
+                zbx_method = None
         else:
             zbx_method = 'create'
 
-        result = "self.zapi.{obj_type}.{zbx_method}".format(
-            obj_type=self.obj_type,
-            zbx_method=zbx_method)
-
-        return result
+        return zbx_method, req
 
     def apply(self):
         """
@@ -64,15 +118,24 @@ class ZabbixObject(object):
         """
 
         result = None
-        req = self._create_request()
+        zbx_method, req = self._prepare()
+        if not zbx_method:
+            log.debug("Unchanged %s: '%s'", self.obj_type, self._get_name())
+            return result
+
         log.info(
                 "%s: '%s'",
                 str(self.obj_type).capitalize(),
-                self.obj.get('name'))
-        func = self._func(req)
+                self._get_name())
+        func = "self.zapi.{obj_type}.{zbx_method}".format(
+            obj_type=self.obj_type,
+            zbx_method=zbx_method)
         log.debug('%s: %s', func, req)
         result = eval(func)(req)
 
+        if zbx_method == 'create':
+            self._remember(self._get_name(), result)
+
         return result
 
     def delete(self):
@@ -0,0 +1,108 @@
+import itertools
+import logging
+import threading
+from snapshot import ZabbixTemplateSnapshot
+from zabbix.api import ZabbixAPI
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixPlan(ZabbixAPI):
+
+    """
+    Wrap ZabbixAPI connector to record changes instead of sending them to
+    zabbix server. Requests which only read data are sent as usual.
+
+    Arguments:
+    zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
+    """
+
+    # Zabbix methods which change something
+    methods = ('create', 'update', 'delete',
+               'massadd', 'massremove', 'massupdate', 'import')
+
+    # Object type: (name field, id field)
+    fields = dict(
+        ZabbixTemplateSnapshot.fields,
+        hostgroup=('name', 'groupid'),
+        template=('host', 'templateid'))
+
+    def __init__(self, zapi):
+        self.zapi = zapi
+        self.changes = []
+        self.lock = threading.Lock()
+        # Fake ids for objects which would be created
+        self.ids = itertools.count(-1, -1)
+
+    def _names(self, obj_type, ids):
+        """
+        Return names of existing objects by their ids.
+        """
+
+        name_field, id_field = self.fields[obj_type]
+        result = self.zapi.do_request(
+            '{0}.get'.format(obj_type),
+            {'output': [name_field], '{0}s'.format(id_field): ids})['result']
+        result = dict((obj[id_field], obj[name_field]) for obj in result)
+        return [result.get(str(id_), id_) for id_ in ids]
+
+    def do_request(self, method, params=None):
+        """
+        Send request to zabbix server, or record it if it changes something.
+        """
+
+        obj_type, zbx_method = method.split('.', 1)
+        if zbx_method not in self.methods:
+            return self.zapi.do_request(method, params)
+
+        if obj_type not in self.fields:
+            with self.lock:
+                self.changes.append((zbx_method, obj_type, '', []))
+            return {'result': True}
+
+        name_field, id_field = self.fields[obj_type]
+        objs = list(params) if isinstance(params, (list, tuple)) else [params]
+
+        if zbx_method == 'create':
+            ids = [str(next(self.ids)) for obj in objs]
+            names = [obj.get(name_field) or obj.get('name') for obj in objs]
+            fields = [[] for obj in objs]
+        elif zbx_method == 'delete':
+            ids = objs
+            names = self._names(obj_type, ids)
+            fields = [[] for obj in objs]
+        else:
+            ids = [obj.get(id_field) for obj in objs]
+            names = self._names(obj_type, ids)
+            fields = [sorted(k for k in obj if k != id_field) for obj in objs]
+
+        with self.lock:
+            for name, obj_fields in zip(names, fields):
+                self.changes.append((zbx_method, obj_type, name, obj_fields))
+
+        return {'result': {'{0}s'.format(id_field): ids}}
+
+    def report(self):
+        """
+        Log all recorded changes.
+        """
+
+        if not self.changes:
+            log.info('Plan: no changes.')
+            return
+
+        log.info('Plan:')
+        for zbx_method, obj_type, name, fields in self.changes:
+            if fields:
+                log.info("\t%s %s '%s': %s", zbx_method, obj_type, name, ', '.join(fields))
+            else:
+                log.info("\t%s %s '%s'", zbx_method, obj_type, name)
+
+        counts = {}
+        for change in self.changes:
+            counts[change[0]] = counts.get(change[0], 0) + 1
+        log.info(
+            'Plan: %s to create, %s to update, %s to delete.',
+            counts.get('create', 0),
+            counts.get('update', 0),
+            counts.get('delete', 0))
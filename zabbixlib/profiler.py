@@ -0,0 +1,176 @@
+import collections
+import contextlib
+import json
+import logging
+import threading
+import time
+from zabbix.api import ZabbixAPI
+
+log = logging.getLogger(__name__)
+
+
+def percentile(values, percent):
+    """
+    Return percentile of sorted values, by nearest rank.
+    """
+
+    if not values:
+        return 0
+    index = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+
+class ZabbixTimer(object):
+
+    """
+    Measure time of sync phases of each template.
+    """
+
+    def __init__(self):
+        # (template name, phase): seconds
+        self.phases = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, template, name):
+        """
+        Measure time of code block as phase of template sync.
+        """
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            with self.lock:
+                key = (template, name)
+                self.phases[key] = self.phases.get(key, 0) + elapsed
+
+    def by_phase(self):
+        """
+        Return  (dict)  Total time of each phase of all templates.
+        """
+
+        result = collections.OrderedDict()
+        for (template, name), elapsed in self.phases.items():
+            result[name] = result.get(name, 0) + elapsed
+        return result
+
+    def by_template(self):
+        """
+        Return  (dict)  Total time of all phases of each template.
+        """
+
+        result = collections.OrderedDict()
+        for (template, name), elapsed in self.phases.items():
+            if template:
+                result[template] = result.get(template, 0) + elapsed
+        return result
+
+
+class ZabbixProfiler(ZabbixAPI):
+
+    """
+    Wrap ZabbixAPI connector to record every request: method, object type,
+    latency, size of request and size of result. Failed requests are
+    recorded too, with size of result 0.
+
+    Arguments:
+    zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
+    """
+
+    def __init__(self, zapi):
+        self.zapi = zapi
+        # (method, object type, latency, request size, result size, failed)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """
+        Forget recorded requests.
+        """
+
+        with self.lock:
+            self.calls = []
+
+    def do_request(self, method, params=None):
+        """
+        Send request to zabbix server and record it.
+        """
+
+        start = time.time()
+        result = None
+        try:
+            result = self.zapi.do_request(method, params)
+        finally:
+            latency = time.time() - start
+            sent = len(json.dumps(params or {}))
+            received = 0
+            if result is not None:
+                received = len(json.dumps(result.get('result')))
+            with self.lock:
+                self.calls.append((
+                    method,
+                    method.split('.', 1)[0],
+                    latency,
+                    sent,
+                    received,
+                    result is None))
+        return result
+
+    def by_method(self):
+        """
+        Return  (dict)  Latencies, number of errors, sent and received bytes
+                        of each method.
+        """
+
+        result = {}
+        for method, obj_type, latency, sent, received, failed in self.calls:
+            stats = result.setdefault(
+                method, {'latency': [], 'errors': 0, 'sent': 0, 'received': 0})
+            stats['latency'].append(latency)
+            stats['errors'] += int(failed)
+            stats['sent'] += sent
+            stats['received'] += received
+        for stats in result.values():
+            stats['latency'].sort()
+        return result
+
+    def report(self, timer=None):
+        """
+        Log calls statistic, and time of phases and templates.
+        """
+
+        log.info('Profile: API calls')
+        log.info(
+            '\t%-28s %6s %6s %8s %8s %8s %8s %10s %10s',
+            'method', 'calls', 'errors', 'p50', 'p95', 'max', 'total', 'sent', 'received')
+        methods = self.by_method()
+        for method in sorted(methods, key=lambda x: -sum(methods[x]['latency'])):
+            stats = methods[method]
+            latency = stats['latency']
+            log.info(
+                '\t%-28s %6s %6s %8.3f %8.3f %8.3f %8.3f %10s %10s',
+                method,
+                len(latency),
+                stats['errors'],
+                percentile(latency, 50),
+                percentile(latency, 95),
+                latency[-1],
+                sum(latency),
+                stats['sent'],
+                stats['received'])
+        log.info(
+            '\t%-28s %6s %6s %35.3f',
+            'total',
+            len(self.calls),
+            sum(call[5] for call in self.calls),
+            sum(call[2] for call in self.calls))
+
+        if timer:
+            log.info('Profile: phases')
+            for name, elapsed in timer.by_phase().items():
+                log.info('\t%-28s %8.3f', name, elapsed)
+            log.info('Profile: templates')
+            for template, elapsed in timer.by_template().items():
+                log.info('\t%-28s %8.3f', template, elapsed)
@@ -0,0 +1,96 @@
+import json
+import logging
+import threading
+from fakeserver import ZabbixFakeStore
+from plan import ZabbixPlan
+from zabbix.api import ZabbixAPI
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixRender(ZabbixAPI):
+
+    """
+    Build requests of templates without zabbix server.
+
+    Requests are executed by in-memory fake zabbix server, which starts
+    empty, so every object of templates is created. Requests which change
+    something are recorded to be written as JSON. Objects which zabbixcli
+    doesn't create itself (users, user groups, media types) are added on
+    first lookup, so all ids in requests are placeholders given by fake
+    server, and they are the same for the same templates.
+
+    Arguments:
+    store       (ZabbixFakeStore) Storage of zabbix objects.
+    """
+
+    # Objects referred by templates, but not managed by zabbixcli
+    external = ('mediatype', 'user', 'usergroup')
+
+    def __init__(self, store=None):
+        self.store = store or ZabbixFakeStore()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def _resolve(self, obj_type, params):
+        """
+        Add external objects which are looked up by name.
+        """
+
+        id_field, name_field = self.store.objects[obj_type]
+        names = params.get('filter', {}).get(name_field)
+        if names is None:
+            return
+
+        known = set(obj.get(name_field) for obj in self.store.tables[obj_type].values())
+        for name in names if isinstance(names, list) else [names]:
+            if name not in known:
+                log.debug('Placeholder %s: %s', obj_type, name)
+                self.store.do_request('{0}.create'.format(obj_type), {name_field: name})
+                known.add(name)
+
+    def do_request(self, method, params=None):
+        """
+        Execute request by fake server, and record it if it changes
+        something.
+        """
+
+        obj_type, zbx_method = method.split('.', 1)
+        if zbx_method == 'get' and obj_type in self.external:
+            self._resolve(obj_type, params or {})
+
+        result = self.store.do_request(method, params)
+        if zbx_method in ZabbixPlan.methods:
+            with self.lock:
+                self.requests.append({
+                    'method': method,
+                    'params': json.loads(json.dumps(params))})
+        return result
+
+    def objects(self):
+        """
+        Return  (dict)  Type and name of objects by their placeholder ids.
+        """
+
+        result = {}
+        for obj_type, table in self.store.tables.items():
+            name_field = self.store.objects[obj_type][1]
+            for id_, obj in table.items():
+                result[id_] = u'{0} {1}'.format(obj_type, obj.get(name_field))
+        return result
+
+    def write(self, f):
+        """
+        Write recorded requests as JSON.
+
+        Arguments:
+        f       (file)  File to write to.
+        """
+
+        log.info('Render: %s requests', len(self.requests))
+        json.dump(
+            {'requests': self.requests, 'objects': self.objects()},
+            f,
+            indent=2,
+            sort_keys=True)
+        f.write('\n')
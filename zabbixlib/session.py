@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+from template import CACHE_DIR
+from zabbix.api import ZabbixAPI
+
+try:
+    from pyzabbix import ZabbixAPIException
+except ImportError:
+    from zabbix.api import ZabbixAPIException
+
+try:
+    import httplib
+    from urlparse import urlparse
+except ImportError:
+    import http.client as httplib
+    from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixSession(ZabbixAPI):
+
+    """
+    ZabbixAPI connector which keeps HTTP connection alive and reuses auth
+    token between runs.
+
+    Token is stored in cache directory, readable by current user only. It is
+    checked once on start, and zabbix server is logged in again only when
+    token is expired. Zabbix checks token before method is run, so such
+    request is sent again after login. Request which fails because
+    connection is lost is sent again only if it doesn't change anything.
+
+    Arguments:
+    url         (str)             Zabbix server URL.
+    user        (str)             Zabbix user name.
+    password    (str)             Zabbix user password.
+    cache_dir   (str)             Directory to store auth token.
+                                  Default: '~/.cache/zabbixcli'
+    timeout     (int)             Timeout of HTTP requests in seconds.
+    """
+
+    # Methods which are called without auth token
+    anonymous = ('apiinfo.version', 'user.login', 'user.checkAuthentication')
+
+    # Errors returned by zabbix server for expired token
+    expired = ('Session terminated', 'Not authorised', 'Not authorized')
+
+    # Methods which don't change anything, besides anonymous ones
+    read_only = ('get',)
+
+    def __init__(self, url, user, password, cache_dir=None, timeout=60):
+        self.use_authenticate = False
+        self.use_basic_auth = False
+        self.base64_cred = None
+        self.url = url + '/api_jsonrpc.php'
+        self.user_name = user
+        self.password = password
+        self.timeout = timeout
+        self.location = urlparse(self.url)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.auth = None
+
+        key = hashlib.sha1(
+            '{0} {1}'.format(self.url, user).encode('utf-8')).hexdigest()
+        self.token_file = os.path.join(
+            os.path.expanduser(cache_dir or CACHE_DIR),
+            'session-{0}'.format(key))
+
+        self.auth = self._read_token()
+        if not (self.auth and self._check_token()):
+            self._relogin()
+        log.debug("JSON-PRC Server: %s", self.url)
+
+    def _read_token(self):
+        try:
+            with open(self.token_file) as f:
+                return f.read().strip() or None
+        except (IOError, OSError):
+            return None
+
+    def _save_token(self):
+        """
+        Save auth token to file which is readable by current user only.
+        """
+
+        tmp = '{0}.{1}'.format(self.token_file, os.getpid())
+        try:
+            dirname = os.path.dirname(self.token_file)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname, 0o700)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.auth)
+            os.rename(tmp, self.token_file)
+        except (IOError, OSError) as e:
+            log.debug('Unable to save auth token %s: %s', self.token_file, e)
+
+    def _check_token(self):
+        """
+        Check if saved auth token is still valid.
+        """
+
+        try:
+            self.do_request(
+                'user.checkAuthentication',
+                {'sessionid': self.auth})
+        except ZabbixAPIException as e:
+            log.debug('Saved auth token is not valid: %s', e)
+            return False
+        log.debug('Saved auth token is used')
+        return True
+
+    def _relogin(self):
+        with self.lock:
+            self._login(self.user_name, self.password)
+            self._save_token()
+
+    def _connection(self, reconnect=False):
+        """
+        Return HTTP connection of current thread.
+        """
+
+        conn = getattr(self.local, 'conn', None)
+        if reconnect and conn:
+            conn.close()
+            conn = None
+        if not conn:
+            if self.location.scheme == 'https':
+                conn_class = httplib.HTTPSConnection
+            else:
+                conn_class = httplib.HTTPConnection
+            conn = conn_class(self.location.netloc, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def _post(self, data, resend=False):
+        """
+        Send request over kept alive connection. If connection is lost,
+        request is sent again over new connection only if resend is True,
+        because request could be already executed by server.
+        """
+
+        path = self.location.path
+        if self.location.query:
+            path = '{0}?{1}'.format(path, self.location.query)
+        headers = {
+            'Content-Type': 'application/json-rpc',
+            'User-Agent': 'zabbixcli',
+            'Connection': 'keep-alive'}
+
+        for reconnect in (False, True):
+            conn = self._connection(reconnect)
+            try:
+                conn.request('POST', path, data, headers)
+                response = conn.getresponse()
+                return response.read().decode('utf-8')
+            except (httplib.HTTPException, socket.error) as e:
+                # Broken connection is not used for next requests
+                conn.close()
+                self.local.conn = None
+                if reconnect or not resend:
+                    raise
+                log.debug('Connection to %s lost: %s', self.url, e)
+
+    def _is_read_only(self, method):
+        """
+        Return  (bool)  True if method doesn't change anything, so it's safe
+                        to send it again.
+        """
+
+        return (method in self.anonymous or
+                method.split('.', 1)[-1] in self.read_only)
+
+    def _call(self, method, params):
+        request_json = {
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': params or {},
+            'id': '1',
+        }
+        if self.auth and method not in self.anonymous:
+            request_json['auth'] = self.auth
+
+        try:
+            res_json = json.loads(self._post(
+                json.dumps(request_json).encode('utf-8'),
+                resend=self._is_read_only(method)))
+        except ValueError as e:
+            raise ZabbixAPIException('Unable to parse json: {0}'.format(e))
+
+        if 'error' in res_json:
+            err = res_json['error'].copy()
+            err.update({'json': str(request_json)})
+            raise ZabbixAPIException(err)
+
+        return res_json
+
+    def do_request(self, method, params=None):
+        """
+        Make request to zabbix API, login again if auth token is expired.
+        """
+
+        log.debug('do_request(%s, %s)', method, params)
+        try:
+            return self._call(method, params)
+        except ZabbixAPIException as e:
+            data = getattr(e, 'data', '') or ''
+            if (method in self.anonymous or
+                    not any(s in data for s in self.expired)):
+                raise
+            log.info('Auth token is expired, login again')
+            self._relogin()
+            return self._call(method, params)
@@ -0,0 +1,200 @@
+import collections
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixTemplateSnapshot(object):
+
+    """
+    Keep objects of zabbix template in memory, indexed by name.
+
+    Objects of each type are fetched with single bulk '<type>.get' request
+    on first access, so template objects don't need separate get_id() call
+    to find out their ids.
+
+    Arguments:
+    zapi          (ZabbixAPI)   ZabbixAPI connector to send request.
+    template_id   (int)         Zabbix Template id.
+    action_names  (list of str) Names of template actions, actions don't
+                                belong to template and are found by name.
+    """
+
+    # Object type: (name field, id field)
+    fields = {
+        'action': ('name', 'actionid'),
+        'application': ('name', 'applicationid'),
+        'discoveryrule': ('name', 'itemid'),
+        'graph': ('name', 'graphid'),
+        'graphprototype': ('name', 'graphid'),
+        'item': ('name', 'itemid'),
+        'itemprototype': ('name', 'itemid'),
+        'trigger': ('description', 'triggerid'),
+        'triggerprototype': ('description', 'triggerid'),
+        'usermacro': ('macro', 'hostmacroid'),
+    }
+
+    # Additional parameters to get objects comparable with requests
+    options = {
+        'action': {'selectConditions': 'extend', 'selectOperations': 'extend'},
+        'discoveryrule': {'selectFilter': 'extend'},
+        'graph': {'selectGraphItems': 'extend'},
+        'graphprototype': {'selectGraphItems': 'extend'},
+        'item': {'selectApplications': ['applicationid']},
+        'itemprototype': {'selectApplications': ['applicationid']},
+        'trigger': {'expandExpression': True},
+        'triggerprototype': {'expandExpression': True},
+    }
+
+    def __init__(self, zapi, template_id, action_names=()):
+        self.zapi = zapi
+        self.template_id = template_id
+        self.action_names = list(action_names)
+        self.index = {}
+        # Names which were not found, by object type
+        self.missing = {}
+        # Number of objects by (object type, action)
+        self.changes = collections.Counter()
+        # Phases of template sync may use snapshot at the same time
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    def _lock(self, obj_type):
+        """
+        Return lock of specific object type, so objects of different types
+        are fetched at the same time, but each type is fetched only once.
+        """
+
+        with self.lock:
+            return self.locks.setdefault(obj_type, threading.RLock())
+
+    def _fetch(self, obj_type):
+        """
+        Fetch all objects of specific type from zabbix server.
+
+        Return  (dict)  Objects indexed by name.
+        """
+
+        result = {}
+        req = {'output': 'extend'}
+        req.update(self.options.get(obj_type, {}))
+
+        # Actions don't belong to template, they are found by exact names
+        if obj_type == 'action':
+            if not self.action_names:
+                return result
+            req['filter'] = {'name': self.action_names}
+        else:
+            req['hostids'] = self.template_id
+
+        name_field = self.fields[obj_type][0]
+        for obj in self.zapi.do_request('{0}.get'.format(obj_type), req)['result']:
+            # Keep first object with the same name, like get_id() does
+            result.setdefault(obj[name_field], obj)
+
+        log.debug('Snapshot %s: %s', obj_type, result.keys())
+        return result
+
+    def objects(self, obj_type):
+        """
+        Return all objects of specific type indexed by name.
+        """
+
+        with self._lock(obj_type):
+            if obj_type not in self.index:
+                self.index[obj_type] = self._fetch(obj_type)
+            return self.index[obj_type]
+
+    def load(self, *obj_types):
+        """
+        Fetch objects of specified types (or all types) at once.
+        """
+
+        for obj_type in obj_types or self.fields.keys():
+            self.objects(obj_type)
+
+    def reset(self, *obj_types):
+        """
+        Forget fetched objects of specified types, they will be fetched again
+        on next access.
+        """
+
+        for obj_type in obj_types:
+            with self._lock(obj_type):
+                self.index.pop(obj_type, None)
+                self.missing.pop(obj_type, None)
+
+    def resolve(self, obj_type, names):
+        """
+        Return ids of zabbix objects of specific type by their names.
+        Names which are not in snapshot yet are fetched with single request.
+
+        Return  (dict)  Object ids indexed by name.
+        """
+
+        name_field, id_field = self.fields[obj_type]
+        with self._lock(obj_type):
+            objects = self.objects(obj_type)
+            missing = self.missing.setdefault(obj_type, set())
+
+            unknown = [name for name in set(names)
+                       if name not in objects and name not in missing]
+            if unknown:
+                req = {
+                    'output': [name_field, id_field],
+                    'filter': {name_field: unknown},
+                    'hostids': self.template_id}
+                for obj in self.zapi.do_request('{0}.get'.format(obj_type), req)['result']:
+                    objects.setdefault(obj[name_field], obj)
+                missing.update(name for name in unknown if name not in objects)
+
+            return dict(
+                (name, int(objects[name][id_field]))
+                for name in names if name in objects)
+
+    def get(self, obj_type, name):
+        """
+        Return zabbix object of specific type by name.
+        """
+
+        return self.objects(obj_type).get(name)
+
+    def get_id(self, obj_type, name):
+        """
+        Return id of zabbix object of specific type by name.
+        """
+
+        result = None
+        obj = self.get(obj_type, name)
+        if obj:
+            result = int(obj[self.fields[obj_type][1]])
+        return result
+
+    def add(self, obj_type, name, obj_id):
+        """
+        Save id of just created object.
+        """
+
+        name_field, id_field = self.fields[obj_type]
+        with self._lock(obj_type):
+            self.objects(obj_type)[name] = {name_field: name, id_field: str(obj_id)}
+            self.missing.get(obj_type, set()).discard(name)
+        self.count(obj_type, 'created')
+
+    def remove(self, obj_type, name):
+        """
+        Forget about deleted object.
+        """
+
+        with self._lock(obj_type):
+            self.objects(obj_type).pop(name, None)
+        self.count(obj_type, 'deleted')
+
+    def count(self, obj_type, action):
+        """
+        Count object which was created, updated, deleted or left unchanged.
+        """
+
+        with self.lock:
+            self.changes[(obj_type, action)] += 1
@@ -1,12 +1,30 @@
 import fnmatch
+import hashlib
+import json
 import logging
 import os
 import pprint
 import yaml
+from diff import diff
 from group import ZabbixGroups
+from zabbixlib import __version__
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# Use fast libyaml based loader if it's available
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 log = logging.getLogger(__name__)
 
+# Default directory for zabbixcli cache files
+CACHE_DIR = '~/.cache/zabbixcli'
+
 
 class ZabbixTemplate(object):
 
@@ -16,11 +34,13 @@ class ZabbixTemplate(object):
     Arguments:
     zapi        (ZabbixAPI)       ZabbixAPI connector to send request.
     obj         (dict)            Dictionary discribed zabbix template.
+    groups      (ZabbixGroupRegistry)  Groups shared by all templates.
     """
 
-    def __init__(self, zapi, obj):
+    def __init__(self, zapi, obj, groups=None):
         self.zapi = zapi
         self.obj = obj
+        self.groups = groups
         self.obj_type = 'template'
 
     def _create_request(self):
@@ -30,7 +50,7 @@ class ZabbixTemplate(object):
         Return  (str)   Request for changes.
         """
 
-        return {'groups': ZabbixGroups(self.zapi, self.obj['groups']).apply()}
+        return {'groups': ZabbixGroups(self.zapi, self.obj['groups'], self.groups).apply()}
 
     def apply(self):
         """
@@ -47,10 +67,20 @@ class ZabbixTemplate(object):
                 'template',
                 self.obj['templates'])
 
-        # Get current template id
-        self.template_id = self.zapi.get_id('template', self.obj['name'])
-
-        if self.template_id:
+        # Get current template with its groups and linked templates
+        current = self.zapi.template.get(
+            filter={'name': self.obj['name']},
+            output=['templateid'],
+            selectGroups=['groupid'],
+            selectParentTemplates=['templateid'])
+
+        if current:
+            self.template_id = current[0]['templateid']
+            current[0]['templates'] = current[0].get('parentTemplates', [])
+            req = diff(req, current[0])
+            if not req:
+                log.debug("Unchanged template: '%s'", self.obj['name'])
+                return self.template_id
             req['templateid'] = self.template_id
             result = self.zapi.template.update(req)
         else:
@@ -61,6 +91,271 @@ class ZabbixTemplate(object):
         return result
 
 
+class ZabbixTemplateIndex(object):
+
+    """
+    Persistent index of template names to their directories. Index is
+    stored in cache file under templates directory.
+
+    Each entry keeps modification time of template file and its directory,
+    so only changed files are read again when index is rebuilt.
+
+    Attributes:
+      templates_dir (str):  Directory that store zabbix templates.
+      pattern (str):        Pattern to search for template files.
+    """
+
+    filename = '.zabbixcli-index.json'
+
+    # Loaded indexes by templates directory and pattern
+    instances = {}
+
+    def __init__(self, templates_dir, pattern='*.yaml'):
+        # Paths are compared with paths of templates directory
+        self.templates_dir = os.path.abspath(templates_dir)
+        self.pattern = pattern
+        self.path = os.path.join(self.templates_dir, self.filename)
+        # File path: [mtime, template name]
+        self.files = {}
+        # Directory path: mtime
+        self.dirs = {}
+        # Template name: file path
+        self.names = {}
+        self.refreshed = False
+        self._read()
+
+    @classmethod
+    def get(cls, templates_dir, pattern='*.yaml'):
+        """
+        Return index for templates directory, it is loaded once per process.
+        """
+
+        key = (os.path.abspath(templates_dir), pattern)
+        if key not in cls.instances:
+            cls.instances[key] = cls(templates_dir, pattern)
+        return cls.instances[key]
+
+    @classmethod
+    def reset(cls):
+        """
+        Allow loaded indexes to be rebuilt again, so templates added since
+        last run are found. Index is rebuilt at most once per run.
+        """
+
+        for index in cls.instances.values():
+            index.refreshed = False
+
+    def _read(self):
+        """
+        Load index from cache file.
+        """
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.files = data['files']
+            self.dirs = data['dirs']
+        except (IOError, OSError, ValueError, KeyError):
+            log.debug('Template index %s not found or broken', self.path)
+            self.files = {}
+            self.dirs = {}
+        self._update_names()
+
+    def _save(self):
+        """
+        Atomically write index to cache file.
+        """
+
+        tmp = '{0}.{1}'.format(self.path, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'files': self.files, 'dirs': self.dirs}, f)
+            os.rename(tmp, self.path)
+        except (IOError, OSError) as e:
+            log.debug('Unable to save template index %s: %s', self.path, e)
+
+    def _update_names(self):
+        self.names = {}
+        for path in sorted(self.files):
+            name = self.files[path][1]
+            if name:
+                self.names.setdefault(name, path)
+
+    def _read_name(self, path):
+        """
+        Return template name from first line of template file.
+        """
+
+        result = None
+        with open(path, 'r') as f:
+            line = f.readline()
+            if line[0:5] == 'name:':
+                result = line[5:].strip(' \'\"\n')
+        return result
+
+    def _fresh(self, path):
+        """
+        Check if index entry for template file is up to date.
+        """
+
+        dirname = os.path.dirname(path)
+        try:
+            if os.path.getmtime(path) != self.files[path][0]:
+                return False
+            # Index file itself changes mtime of templates directory
+            if dirname == self.templates_dir:
+                return True
+            return os.path.getmtime(dirname) == self.dirs.get(dirname)
+        except (OSError, KeyError):
+            return False
+
+    def refresh(self):
+        """
+        Rebuild index. Only new and changed template files are read.
+        """
+
+        files = {}
+        dirs = {}
+        for root, subdirs, names in os.walk(self.templates_dir):
+            dirs[root] = os.path.getmtime(root)
+            for name in fnmatch.filter(names, self.pattern):
+                path = os.path.join(root, name)
+                mtime = os.path.getmtime(path)
+                entry = self.files.get(path)
+                if entry and entry[0] == mtime:
+                    files[path] = entry
+                else:
+                    files[path] = [mtime, self._read_name(path)]
+
+        log.debug('Template index was rebuilt: %s files', len(files))
+        self.files = files
+        self.dirs = dirs
+        self.refreshed = True
+        self._update_names()
+        self._save()
+
+    def owner(self, path):
+        """
+        Return name of template which file belongs to. Template directory is
+        the nearest directory with file which has template name.
+        """
+
+        if not self.refreshed:
+            self.refresh()
+
+        dirs = {}
+        for file_, (mtime, name) in self.files.items():
+            if name:
+                dirs.setdefault(os.path.dirname(file_), name)
+
+        dirname = os.path.dirname(path)
+        while dirname.startswith(self.templates_dir):
+            if dirname in dirs:
+                return dirs[dirname]
+            if dirname == os.path.dirname(dirname):
+                break
+            dirname = os.path.dirname(dirname)
+
+    def find(self, name):
+        """
+        Return directory of template by its name.
+        """
+
+        path = self.names.get(name)
+        if not (path and self._fresh(path)) and not self.refreshed:
+            self.refresh()
+            path = self.names.get(name)
+        if path:
+            return os.path.dirname(path)
+
+
+class ZabbixTemplateCache(object):
+
+    """
+    Cache of parsed template files. Cache entry is valid while size and
+    modification time of file are the same, or while file content has the
+    same hash, so unchanged files are never parsed again.
+
+    Attributes:
+      cache_dir (str):      Directory to store parsed files.
+                            Default: '~/.cache/zabbixcli'
+    """
+
+    # Statistic of cache usage
+    hits = 0
+    misses = 0
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = os.path.join(
+            os.path.expanduser(cache_dir or CACHE_DIR), 'yaml')
+
+    @classmethod
+    def reset_stats(cls):
+        """
+        Forget statistic of cache usage, it's counted for each run.
+        """
+
+        cls.hits = 0
+        cls.misses = 0
+
+    def _path(self, file_):
+        """
+        Return path to cache entry of template file.
+        """
+
+        key = hashlib.sha1(os.path.abspath(file_).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, '{0}.pickle'.format(key))
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def _save(self, path, entry):
+        """
+        Atomically write cache entry.
+        """
+
+        tmp = '{0}.{1}'.format(path, os.getpid())
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir, 0o700)
+            with open(tmp, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, path)
+        except (IOError, OSError) as e:
+            log.debug('Unable to save cache %s: %s', path, e)
+
+    def load(self, file_):
+        """
+        Return parsed template file.
+        """
+
+        path = self._path(file_)
+        stat = os.stat(file_)
+        entry = self._read(path)
+
+        if entry and (entry['size'], entry['mtime']) == (stat.st_size, stat.st_mtime):
+            ZabbixTemplateCache.hits += 1
+            return entry['data']
+
+        with open(file_, 'rb') as f:
+            str_buf = f.read()
+        digest = hashlib.sha1(str_buf).hexdigest()
+
+        if entry and entry['sha1'] == digest:
+            ZabbixTemplateCache.hits += 1
+        else:
+            ZabbixTemplateCache.misses += 1
+            entry = {'sha1': digest, 'data': yaml.load(str_buf, Loader=SafeLoader)}
+
+        entry.update({'size': stat.st_size, 'mtime': stat.st_mtime})
+        self._save(path, entry)
+        return entry['data']
+
+
 class ZabbixTemplateFile(dict):
 
     """
@@ -72,6 +367,8 @@ class ZabbixTemplateFile(dict):
       basedir (str):        Directory that store zabbix templates.
                             Default: './templates'
       file_extension (str): Extension for template files. Default: '.yaml'
+      templates_dir (str):  Directory to search templates by name.
+      cache_dir (str):      Directory to store parsed template files.
     """
 
     def __init__(
@@ -80,12 +377,14 @@ class ZabbixTemplateFile(dict):
             pattern='*',
             basedir='./',
             file_extension='.yaml',
-            templates_dir=None):
+            templates_dir=None,
+            cache_dir=None):
         self.name = name
         self.file_extension = file_extension
         self.pattern = pattern + self.file_extension
         self.basedir = '{0}/{1}'.format(basedir, name)
         self.templates_dir = templates_dir
+        self.cache = ZabbixTemplateCache(cache_dir)
         # Load template from files
         self.template = {}
         self.processed_items = 0
@@ -111,18 +410,11 @@ class ZabbixTemplateFile(dict):
 
         result = None
 
-        # get list of files
-        files_list = self._walk(self.templates_dir)
-
-        for file_ in files_list:
-            with open(file_, 'r') as f:
-                line = f.readline()
-                if line[0:5] == 'name:':
-                    name = line[5:].strip(' \'\"\n')
-                    if name == self.name:
-                        result = os.path.dirname(file_)
-                        log.debug('Found Template: "%s" in %s', name, result)
-                        break
+        if self.templates_dir:
+            index = ZabbixTemplateIndex.get(self.templates_dir, self.pattern)
+            result = index.find(self.name)
+            if result:
+                log.debug('Found Template: "%s" in %s', self.name, result)
         return result
 
     def _merge(self, t1, t2):
@@ -158,17 +450,19 @@ class ZabbixTemplateFile(dict):
         log.debug("Template files list: %s", files_list)
 
         for file_ in files_list:
-            # Read template file
-            with open(file_) as f:
-                str_buf = f.read()
-                # Load template
-                template = yaml.safe_load(str_buf)
-                log.debug(
-                    'Template loaded from "%s":\n%s',
-                    file_,
-                    template)
-                # Merge template
-                self._merge(result, template)
+            # Load template, parsed file is taken from cache if possible
+            template = self.cache.load(file_)
+            log.debug(
+                'Template loaded from "%s":\n%s',
+                file_,
+                template)
+            # Merge template
+            self._merge(result, template)
+
+        log.debug(
+            'Template cache: %s hits, %s misses',
+            ZabbixTemplateCache.hits,
+            ZabbixTemplateCache.misses)
 
         if not result:
             log.debug("Trying find template in %s", self.templates_dir)
@@ -182,6 +476,23 @@ class ZabbixTemplateFile(dict):
 
         return result
 
+    def fingerprint(self, defaults=None, name=None):
+        """
+        Arguments:
+        defaults  (ZabbixDefaults)  Default values.
+        name      (str)             Name template was requested with.
+
+        Return  (str)   Hash of merged template, default values, requested
+                        name and zabbixcli version, it's changed only if
+                        any of them is changed.
+        """
+
+        data = json.dumps(
+            [self.template, defaults and defaults.__dict__, name, __version__],
+            sort_keys=True,
+            default=str)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
     def __getitem__(self, item, value=None):
         return self.template.get(item, value)
 
@@ -14,14 +14,16 @@ class ZabbixTrigger(ZabbixObject):
     obj         (dict)            Dictionary discribed zabbix trigger template.
     defaults    (ZabbixDefaults)  Default values.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, defaults, template_id):
+    def __init__(self, zapi, obj, defaults, template_id, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.defaults = defaults
         self.template_id = template_id
         self.obj_type = 'trigger'
+        self.snapshot = snapshot
         ZabbixObject(self.zapi, self.obj, self.template_id)
 
     def _create_request(self):
@@ -54,13 +56,15 @@ class ZabbixTriggerPrototype(ZabbixTrigger):
     obj         (dict)            Dictionary discribed zabbix trigger prototype template.
     defaults    (ZabbixDefaults)  Default values.
     template_id (int)             Zabbix Template id.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, defaults, template_id):
+    def __init__(self, zapi, obj, defaults, template_id, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.defaults = defaults
         self.template_id = template_id
+        self.snapshot = snapshot
         ZabbixTrigger(self.zapi, self.obj, self.defaults, self.template_id)
 
     def _create_request(self):
@@ -6,6 +6,14 @@ from object import ZabbixObject
 log = logging.getLogger(__name__)
 
 
+def action_name(template_name, alert):
+    """
+    Return name of zabbix action created for template alert.
+    """
+
+    return u'{0}: {1}'.format(template_name, alert['name'])
+
+
 class ZabbixTriggerAction(ZabbixObject):
 
     """
@@ -14,15 +22,18 @@ class ZabbixTriggerAction(ZabbixObject):
     Arguments:
     zapi  (ZabbixAPI)   ZabbixAPI connector to send request.
     obj   (dict)        Dictionary discribed zabbix application template.
+    template_name (str) Zabbix Template name, action names start with it.
+    snapshot    (ZabbixTemplateSnapshot)  Objects of current template.
     """
 
-    def __init__(self, zapi, obj, defaults, template_id, template_name):
+    def __init__(self, zapi, obj, defaults, template_id, template_name, snapshot=None):
         self.zapi = zapi
         self.obj = obj
         self.obj_type = 'action'
         self.defaults = defaults
         self.template_id = template_id
         self.template_name = template_name
+        self.snapshot = snapshot
         ZabbixObject(self.zapi, self.obj)
 
     def _create_request(self):
@@ -35,7 +46,7 @@ class ZabbixTriggerAction(ZabbixObject):
         result = {}
 
         if self.obj:
-            result['name'] = '{0}: {1}'.format(self.template_name, self.obj['name'])
+            result['name'] = action_name(self.template_name, self.obj)
             result['def_shortdata'] = self.obj.get('subject',
                     self.defaults['default']['alert']['subject'])
             result['def_longdata'] = self.obj.get('text',
@@ -160,11 +171,16 @@ class ZabbixTriggerAction(ZabbixObject):
         log.debug(
             'ZabbixTriggerAction._create_request: {req}'.format(
                 req=req))
-        obj_id = self.zapi.get_id('action', req['name'])
+        name = req['name']
+        obj_id = self._get_id('action', name)
 
         if obj_id:
+            req = self._changes(name, req)
+            if not req:
+                log.debug("Unchanged action: '%s'", name)
+                return result
             req['actionid'] = obj_id
-            req.pop('name')
+            req.pop('name', None)
             obj_action = 'update'
         else:
             obj_action = 'create'
@@ -174,4 +190,7 @@ class ZabbixTriggerAction(ZabbixObject):
             obj_action=obj_action)
         result = eval(func)(req)
 
+        if obj_action == 'create':
+            self._remember(name, result)
+
         return result
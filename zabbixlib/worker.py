@@ -0,0 +1,254 @@
+import logging
+import os
+import subprocess
+import sys
+from cli import ZabbixCLI, ZabbixCLIArguments
+from defaults import ZabbixDefaults
+from dependency import ZabbixTemplateGraph
+from jobqueue import ZabbixJobQueue
+from template import CACHE_DIR, ZabbixTemplateIndex
+
+log = logging.getLogger(__name__)
+
+
+class ZabbixWorker(ZabbixCLI):
+
+    """
+    Apply templates changed in git repository since last run.
+
+    Changed files are mapped to templates, so each changed template is
+    applied once per run, whatever number of its files were changed. All
+    templates are applied in one process with the same zabbix session.
+
+    Changed templates are put in queue, and only one worker applies them at
+    the same time. Templates changed while they are applied are applied
+    again after that, templates which were failed stay in queue for next run.
+    SHA of commit is saved only when all its changes are applied.
+
+    Arguments:
+    argv        (list of str)     Arguments to parse. Default: sys.argv
+    """
+
+    description = 'Apply changes of zabbix templates from git repository'
+
+    def __init__(self, argv=None):
+        ZabbixCLIArguments.__init__(self, argv)
+        self._configureLogging()
+        log.debug('Parser arguments: %s', self.args)
+
+        self.args['repo_dir'] = os.path.abspath(self.args['repo_dir'])
+        self.args['templates_dir'] = os.path.normpath(os.path.join(
+            self.args['repo_dir'],
+            self.args['repo_templates']))
+
+        self.zapi = None
+
+        # Set defaults and run apply process
+        self.config = ZabbixDefaults()
+        self.run()
+
+    def _add_arguments(self):
+        ZabbixCLI._add_arguments(self)
+        self.argparser.add_argument(
+            'repo_dir',
+            help='Path to git repository, eg. /opt/devops/')
+        self.argparser.add_argument(
+            'repo_templates',
+            help='Relative path to zabbix templates in repository, '
+                 'eg. configs/zabbix/templates')
+        self.argparser.add_argument(
+            '--state-file',
+            action='store',
+            type=str,
+            default='/tmp/template-repo-last-sha',
+            help='File to save SHA of applied commit. '
+                 'Default: /tmp/template-repo-last-sha')
+        self.argparser.add_argument(
+            '--branch',
+            action='store',
+            type=str,
+            default='master',
+            help='Branch to pull from origin. Default: master')
+        self.argparser.add_argument(
+            '--no-pull',
+            action='store_true',
+            help='Don\'t pull changes, use current HEAD')
+        self.argparser.add_argument(
+            '--with-dependents',
+            action='store_true',
+            help='Also apply templates which link changed templates')
+        self.argparser.add_argument(
+            '--queue-file',
+            action='store',
+            type=str,
+            help='File to keep queue of templates. '
+                 'Default: ~/.cache/zabbixcli/queue.json')
+
+    def _git(self, *args):
+        """
+        Run git command in repository and return its output.
+        """
+
+        return subprocess.check_output(
+            ('git',) + args,
+            cwd=self.args['repo_dir']).decode('utf-8')
+
+    def _read_state(self):
+        try:
+            with open(self.args['state_file']) as f:
+                return f.read().strip() or None
+        except (IOError, OSError):
+            return None
+
+    def _save_state(self, sha):
+        """
+        Atomically save SHA of applied commit.
+        """
+
+        path = self.args['state_file']
+        tmp = '{0}.{1}'.format(path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(sha)
+        os.rename(tmp, path)
+
+    def changed_files(self, prev_sha, sha):
+        """
+        Return absolute paths of template files changed between commits.
+        """
+
+        output = self._git(
+            'diff', '--name-only', '-z', prev_sha, sha,
+            '--', self.args['repo_templates'])
+        return sorted(set(
+            os.path.normpath(os.path.join(self.args['repo_dir'], path))
+            for path in output.split('\0') if path))
+
+    def changed_templates(self, files):
+        """
+        Return names of templates which files belong to.
+        """
+
+        index = ZabbixTemplateIndex.get(self.args['templates_dir'])
+        result = set()
+        for file_ in files:
+            name = index.owner(file_)
+            if name:
+                result.add(name)
+            else:
+                log.warning('File %s does not belong to any template', file_)
+        return result
+
+    def dependents(self, names):
+        """
+        Return templates which link specified templates, directly or
+        through other templates.
+        """
+
+        index = ZabbixTemplateIndex.get(self.args['templates_dir'])
+        graph = ZabbixTemplateGraph(
+            sorted(index.names),
+            templates_dir=self.args['templates_dir'],
+            only=True,
+            cache_dir=self.args.get('cache_dir'))
+
+        result = set(names)
+        changed = True
+        while changed:
+            changed = False
+            for name, template in graph.templates.items():
+                if name not in result and result.intersection(template.get('templates', [])):
+                    result.add(name)
+                    changed = True
+        return result
+
+    def changes(self, queue):
+        """
+        Pull repository and find templates changed since last queued commit.
+
+        Return  (tuple)  Template names and SHA of current commit.
+        """
+
+        if not self.args.get('no_pull'):
+            self._git('pull', 'origin', self.args['branch'])
+        sha = self._git('rev-parse', 'HEAD').strip()
+
+        # Changes which are queued, but not applied yet, are not queued again
+        prev_sha = queue.sha() or self._read_state()
+        if not prev_sha:
+            log.info('No previous state, save current commit %s', sha)
+            return set(), sha
+        if prev_sha == sha:
+            log.debug('No new commits since %s', sha)
+            return set(), None
+
+        files = self.changed_files(prev_sha, sha)
+        names = self.changed_templates(files)
+        log.info('Changed templates: %s', ', '.join(sorted(names)) or 'none')
+
+        if names and self.args.get('with_dependents'):
+            names = self.dependents(names)
+            log.info('Templates to apply: %s', ', '.join(sorted(names)))
+
+        return names, sha
+
+    def process(self, queue):
+        """
+        Apply queued templates, until queue is empty.
+        """
+
+        while True:
+            if not queue.acquire():
+                if queue.pending():
+                    log.info(
+                        'Templates are applied by other worker, '
+                        '%s templates will be applied after it',
+                        queue.pending())
+                return
+
+            errors = None
+            try:
+                jobs = queue.take()
+                if jobs:
+                    if not self.zapi:
+                        self._connect()
+                    self.applied = set()
+                    # Each template leaves queue as soon as it's applied
+                    errors = self.apply_templates(sorted(jobs), done=queue.done)
+                    # Failed templates will be applied next time
+                    if errors:
+                        queue.retry(errors.keys())
+                else:
+                    sha = queue.finished()
+                    if sha and sha != self._read_state():
+                        self._save_state(sha)
+                        log.info('Applied changes of commit %s', sha)
+            finally:
+                queue.release()
+
+            if errors:
+                sys.exit('Failed to apply templates: {0}'.format(
+                    ', '.join(errors.keys())))
+            if not jobs and not queue.pending():
+                return
+
+    def run(self):
+        """
+        Put changed templates in queue and apply them.
+        """
+
+        queue = ZabbixJobQueue(
+            self.args.get('queue_file') or
+            os.path.join(self.args.get('cache_dir', CACHE_DIR), 'queue.json'))
+        self.args['only'] = True
+
+        # Only one worker looks for changes at the same time
+        lock = queue.lock('state')
+        try:
+            names, sha = self.changes(queue)
+            if sha:
+                queue.put(names, sha=sha)
+                log.info('Queued changes of commit %s', sha)
+        finally:
+            lock.close()
+
+        self.process(queue)